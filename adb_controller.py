@@ -3,10 +3,17 @@ ADB 控制器 - 负责与安卓模拟器的交互
 """
 
 import subprocess
+import struct
 import time
 import logging
-from typing import Tuple, Optional
+import threading
+from typing import Tuple, Optional, List, Dict, Any
 from config import Config
+from retry_policy import Deadline, RetryPolicy
+from utils import Utils
+
+# 截图方式: "pull" 设备上保存后拉取，"exec-out" 直接读取 PNG，"raw" 直接读取未压缩像素
+CAPTURE_BACKENDS = ("pull", "exec-out", "raw")
 
 class ADBController:
     """ADB 控制器类，封装所有与安卓设备交互的功能"""
@@ -15,6 +22,120 @@ class ADBController:
         """初始化 ADB 控制器"""
         self.device_id = f"{Config.ADB_HOST}:{Config.ADB_PORT}"
         self.logger = logging.getLogger(__name__)
+        self.policy = RetryPolicy(reconnect=self.fast_reconnect)
+        self.cycle_deadline: Optional[Deadline] = None
+        # 设备可用标志，看门狗恢复连接期间清除，设备命令立即失败而不是等待超时
+        self.device_ready = threading.Event()
+        self.device_ready.set()
+        # 设备清单（discover 模式生成），用于自动选择截图方式
+        self._inventory: Optional[Dict[str, Any]] = None
+    
+    @property
+    def capture_backend(self) -> str:
+        """
+        当前设备使用的截图方式
+        
+        Config.CAPTURE_BACKEND 为 "auto" 时使用设备清单中探测到的最快方式，清单中没有该设备时使用 "pull"。
+        """
+        if Config.CAPTURE_BACKEND != "auto":
+            return Config.CAPTURE_BACKEND
+        if self._inventory is None:
+            self._inventory = (Utils.load_config(Config.DEVICE_INVENTORY_PATH) or {}).get("devices", {})
+        return self._inventory.get(self.device_id, {}).get("capture_backend") or "pull"
+    
+    def begin_cycle(self, seconds: float = None) -> Deadline:
+        """
+        开始一个检查周期，之后的 ADB 调用共享该周期的截止时间
+        
+        Args:
+            seconds (float): 周期可用时间，默认使用 Config.CYCLE_DEADLINE
+            
+        Returns:
+            Deadline: 本周期截止时间
+        """
+        if seconds is None:
+            seconds = Config.CYCLE_DEADLINE
+        self.cycle_deadline = Deadline(seconds)
+        return self.cycle_deadline
+    
+    def end_cycle(self):
+        """结束当前检查周期，后续调用不再受周期截止时间限制"""
+        self.cycle_deadline = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取 ADB 调用的重试 / 熔断计数
+        
+        Returns:
+            Dict[str, Any]: 计数器快照
+        """
+        return self.policy.get_stats()
+    
+    def _run_adb(self, args: List[str], timeout: float, deadline: Deadline = None,
+                 retry: bool = True, device: bool = True, is_success=None,
+                 binary: bool = False) -> Optional[subprocess.CompletedProcess]:
+        """
+        按重试策略执行一条 adb 命令
+        
+        Args:
+            args (List[str]): adb 之后的参数
+            timeout (float): 单次调用超时时间（秒）
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
+            retry (bool): 失败后是否重试，点击等非幂等操作应为 False
+            device (bool): 是否通过 -s 指定当前设备
+            is_success: 判断执行结果是否成功的函数，默认检查返回码为 0
+            binary (bool): 是否以字节形式读取输出（截图数据等）
+            
+        Returns:
+            Optional[subprocess.CompletedProcess]: 最后一次执行结果，超时 / 熔断 / 超过截止时间时返回 None
+        """
+        if device and not self.device_ready.is_set():
+            self.logger.debug(f"设备恢复中，跳过命令: {args}")
+            return None
+        
+        if deadline is None:
+            deadline = self.cycle_deadline
+        
+        command = ["adb", "-s", self.device_id] + args if device else ["adb"] + args
+        
+        def operation(call_timeout: float) -> subprocess.CompletedProcess:
+            return subprocess.run(command, capture_output=True, text=not binary, timeout=call_timeout)
+        
+        if is_success is None:
+            is_success = lambda result: result.returncode == 0
+        
+        return self.policy.call(operation, timeout, deadline, retry, is_success)
+    
+    @staticmethod
+    def _error_text(result: Optional[subprocess.CompletedProcess]) -> str:
+        """获取失败原因描述"""
+        if result is None:
+            return "超时、熔断或超过周期截止时间"
+        output = result.stderr.strip() or result.stdout.strip()
+        if isinstance(output, bytes):
+            output = output[:200].decode("utf-8", "replace")
+        return output or f"返回码 {result.returncode}"
+    
+    def fast_reconnect(self) -> bool:
+        """
+        快速重连设备（不经过重试策略，供熔断器调用）
+        
+        Returns:
+            bool: 重连是否成功
+        """
+        try:
+            subprocess.run(
+                ["adb", "disconnect", self.device_id],
+                capture_output=True, text=True, timeout=Config.RECONNECT_TIMEOUT
+            )
+            result = subprocess.run(
+                ["adb", "connect", self.device_id],
+                capture_output=True, text=True, timeout=Config.RECONNECT_TIMEOUT
+            )
+            return result.returncode == 0 and "connected to" in result.stdout
+        except Exception as e:
+            self.logger.error(f"快速重连时发生错误: {e}")
+            return False
         
     def connect_device(self) -> bool:
         """
@@ -24,24 +145,19 @@ class ADBController:
             bool: 连接是否成功
         """
         try:
-            # 连接设备
-            result = subprocess.run(
-                ["adb", "connect", self.device_id],
-                capture_output=True,
-                text=True,
-                timeout=10
+            # 连接设备（adb connect 失败时返回码也可能为 0，需检查输出）
+            result = self._run_adb(
+                ["connect", self.device_id], Config.ADB_TRANSFER_TIMEOUT, device=False,
+                is_success=lambda r: "connected to" in r.stdout
             )
             
-            if result.returncode == 0:
+            if result is not None and "connected to" in result.stdout:
                 self.logger.info(f"成功连接到设备: {self.device_id}")
                 return True
             else:
-                self.logger.error(f"连接设备失败: {result.stderr}")
+                self.logger.error(f"连接设备失败: {self._error_text(result)}")
                 return False
                 
-        except subprocess.TimeoutExpired:
-            self.logger.error("连接设备超时")
-            return False
         except FileNotFoundError:
             self.logger.error("未找到 ADB 工具，请确保已安装并添加到环境变量")
             return False
@@ -49,124 +165,256 @@ class ADBController:
             self.logger.error(f"连接设备时发生错误: {e}")
             return False
     
-    def is_device_connected(self) -> bool:
+    def get_device_state(self) -> Optional[str]:
         """
-        检查设备是否已连接
+        获取设备在 adb devices 中的状态
         
         Returns:
-            bool: 设备是否已连接
+            Optional[str]: "device"、"offline"、"unauthorized" 等状态，未列出或查询失败时返回 None
         """
         try:
             result = subprocess.run(
                 ["adb", "devices"],
                 capture_output=True,
                 text=True,
-                timeout=5
+                timeout=Config.ADB_COMMAND_TIMEOUT
             )
             
-            return self.device_id in result.stdout and "device" in result.stdout
+            # 输出格式: "<serial>\t<state>"，首行为标题
+            for line in result.stdout.splitlines()[1:]:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == self.device_id:
+                    return parts[1]
+            return None
             
         except Exception as e:
-            self.logger.error(f"检查设备连接状态时发生错误: {e}")
-            return False
+            self.logger.error(f"查询设备状态时发生错误: {e}")
+            return None
     
-    def click(self, x: int, y: int) -> bool:
+    def is_device_connected(self) -> bool:
+        """
+        检查设备是否已连接
+        
+        Returns:
+            bool: 设备是否已连接
+        """
+        state = self.get_device_state()
+        if state is not None and state != "device":
+            self.logger.warning(f"设备状态异常: {state}")
+        return state == "device"
+    
+    def click(self, x: int, y: int, deadline: Deadline = None) -> bool:
         """
         在指定坐标点击
         
         Args:
             x (int): X 坐标
             y (int): Y 坐标
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
             
         Returns:
             bool: 点击是否成功
         """
         try:
-            result = subprocess.run(
-                ["adb", "-s", self.device_id, "shell", "input", "tap", str(x), str(y)],
-                capture_output=True,
-                text=True,
-                timeout=5
+            # 点击不是幂等操作，超时后不自动重试
+            result = self._run_adb(
+                ["shell", "input", "tap", str(x), str(y)],
+                Config.ADB_COMMAND_TIMEOUT, deadline, retry=False
             )
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 self.logger.info(f"成功点击坐标: ({x}, {y})")
                 time.sleep(Config.CLICK_DELAY)
                 return True
             else:
-                self.logger.error(f"点击失败: {result.stderr}")
+                self.logger.error(f"点击失败: {self._error_text(result)}")
                 return False
                 
         except Exception as e:
             self.logger.error(f"点击时发生错误: {e}")
             return False
     
-    def take_screenshot(self, save_path: str = None) -> bool:
+    def take_screenshot(self, save_path: str = None, deadline: Deadline = None) -> bool:
         """
         截取屏幕截图
         
         Args:
             save_path (str): 保存路径，默认使用配置中的路径
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
             
         Returns:
             bool: 截图是否成功
         """
         if save_path is None:
             save_path = Config.SCREENSHOT_PATH
+        
+        backend = self.capture_backend
+        if backend in ("exec-out", "raw"):
+            return self._capture_exec_out(save_path, deadline, raw=backend == "raw")
             
         try:
             # 在设备上截图
-            result = subprocess.run(
-                ["adb", "-s", self.device_id, "shell", "screencap", "-p", "/sdcard/screenshot.png"],
-                capture_output=True,
-                text=True,
-                timeout=10
+            result = self._run_adb(
+                ["shell", "screencap", "-p", "/sdcard/screenshot.png"],
+                Config.ADB_TRANSFER_TIMEOUT, deadline
             )
             
-            if result.returncode != 0:
-                self.logger.error(f"设备截图失败: {result.stderr}")
+            if result is None or result.returncode != 0:
+                self.logger.error(f"设备截图失败: {self._error_text(result)}")
                 return False
             
             # 将截图拉取到本地
-            result = subprocess.run(
-                ["adb", "-s", self.device_id, "pull", "/sdcard/screenshot.png", save_path],
-                capture_output=True,
-                text=True,
-                timeout=10
+            result = self._run_adb(
+                ["pull", "/sdcard/screenshot.png", save_path],
+                Config.ADB_TRANSFER_TIMEOUT, deadline
             )
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 self.logger.info(f"截图保存成功: {save_path}")
                 return True
             else:
-                self.logger.error(f"拉取截图失败: {result.stderr}")
+                self.logger.error(f"拉取截图失败: {self._error_text(result)}")
+                return False
+                
+        except Exception as e:
+            self.logger.error(f"截图时发生错误: {e}")
+            return False
+    
+    def _capture_exec_out(self, save_path: str, deadline: Deadline = None, raw: bool = False) -> bool:
+        """
+        通过 exec-out 直接读取截图数据，省去设备端写文件和 pull 两步
+        
+        Args:
+            save_path (str): 保存路径
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
+            raw (bool): 是否读取未压缩像素（省去设备端 PNG 编码，由本机保存为不压缩的 PNG）
+            
+        Returns:
+            bool: 截图是否成功
+        """
+        try:
+            data = self.capture_bytes(raw, deadline)
+            if data is None:
                 return False
+            
+            if not raw:
+                with open(save_path, "wb") as f:
+                    f.write(data)
+            else:
+                header = self.parse_raw_header(data)
+                if header is None:
+                    self.logger.error("无法解析 raw 截图数据")
+                    return False
                 
+                import cv2
+                import numpy as np
+                width, height, _, offset = header
+                pixels = np.frombuffer(data, np.uint8, width * height * 4, offset).reshape(height, width, 4)
+                cv2.imwrite(save_path, cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 0])
+            
+            self.logger.info(f"截图保存成功: {save_path}")
+            return True
+            
         except Exception as e:
             self.logger.error(f"截图时发生错误: {e}")
             return False
     
-    def press_back(self) -> bool:
+    def capture_bytes(self, raw: bool = False, deadline: Deadline = None) -> Optional[bytes]:
+        """
+        通过 exec-out 读取截图数据
+        
+        Args:
+            raw (bool): True 读取未压缩像素（含文件头），False 读取 PNG
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
+            
+        Returns:
+            Optional[bytes]: 截图数据，失败时返回 None
+        """
+        args = ["exec-out", "screencap"] if raw else ["exec-out", "screencap", "-p"]
+        result = self._run_adb(args, Config.ADB_TRANSFER_TIMEOUT, deadline, binary=True)
+        
+        if result is None or result.returncode != 0 or not result.stdout:
+            self.logger.error(f"设备截图失败: {self._error_text(result)}")
+            return None
+        return result.stdout
+    
+    @staticmethod
+    def parse_raw_header(data: bytes) -> Optional[Tuple[int, int, int, int]]:
+        """
+        解析 screencap 原始输出的文件头
+        
+        Android 9 起文件头为 16 字节（宽、高、像素格式、色彩空间），更早版本为 12 字节。
+        
+        Args:
+            data (bytes): screencap 原始输出
+            
+        Returns:
+            Optional[Tuple[int, int, int, int]]: (宽, 高, 像素格式, 像素数据偏移)，
+                不是 4 字节像素（RGBA_8888 / RGBX_8888）或长度不符时返回 None
+        """
+        if len(data) < 12:
+            return None
+        width, height, pixel_format = struct.unpack_from("<III", data)
+        if pixel_format not in (1, 2) or width == 0 or height == 0:
+            return None
+        offset = len(data) - width * height * 4
+        if offset not in (12, 16):
+            return None
+        return width, height, pixel_format, offset
+    
+    def push_file(self, local_path: str, remote_path: str) -> bool:
+        """
+        把本地文件推送到设备
+        
+        Args:
+            local_path (str): 本地路径
+            remote_path (str): 设备上的路径
+            
+        Returns:
+            bool: 推送是否成功
+        """
+        result = self._run_adb(["push", local_path, remote_path], Config.ADB_TRANSFER_TIMEOUT)
+        if result is None or result.returncode != 0:
+            self.logger.error(f"推送文件失败: {self._error_text(result)}")
+            return False
+        return True
+    
+    def kill_process(self, pattern: str) -> bool:
+        """
+        结束设备上命令行匹配指定模式的进程
+        
+        Args:
+            pattern (str): pkill -f 的匹配模式
+            
+        Returns:
+            bool: 是否有进程被结束
+        """
+        result = self._run_adb(["shell", "pkill", "-f", pattern], Config.ADB_COMMAND_TIMEOUT, retry=False)
+        return result is not None and result.returncode == 0
+    
+    def press_back(self, deadline: Deadline = None) -> bool:
         """
         按下返回键
         
+        Args:
+            deadline (Deadline): 截止时间，默认使用当前周期的截止时间
+            
         Returns:
             bool: 操作是否成功
         """
         try:
-            result = subprocess.run(
-                ["adb", "-s", self.device_id, "shell", "input", "keyevent", "KEYCODE_BACK"],
-                capture_output=True,
-                text=True,
-                timeout=5
+            # 返回键不是幂等操作，超时后不自动重试
+            result = self._run_adb(
+                ["shell", "input", "keyevent", "KEYCODE_BACK"],
+                Config.ADB_COMMAND_TIMEOUT, deadline, retry=False
             )
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 self.logger.info("成功按下返回键")
                 time.sleep(Config.CLICK_DELAY)
                 return True
             else:
-                self.logger.error(f"按下返回键失败: {result.stderr}")
+                self.logger.error(f"按下返回键失败: {self._error_text(result)}")
                 return False
                 
         except Exception as e:
@@ -181,14 +429,9 @@ class ADBController:
             Optional[Tuple[int, int]]: 屏幕尺寸 (width, height)，失败时返回 None
         """
         try:
-            result = subprocess.run(
-                ["adb", "-s", self.device_id, "shell", "wm", "size"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            result = self._run_adb(["shell", "wm", "size"], Config.ADB_COMMAND_TIMEOUT)
             
-            if result.returncode == 0:
+            if result is not None and result.returncode == 0:
                 # 解析输出，格式类似: Physical size: 1080x1920
                 output = result.stdout.strip()
                 if ":" in output:
@@ -197,7 +440,7 @@ class ADBController:
                     self.logger.info(f"屏幕尺寸: {width}x{height}")
                     return (width, height)
             
-            self.logger.error(f"获取屏幕尺寸失败: {result.stderr}")
+            self.logger.error(f"获取屏幕尺寸失败: {self._error_text(result)}")
             return None
             
         except Exception as e:
@@ -0,0 +1,202 @@
+"""
+异步日志 - 队列化日志输出、JSON 结构化文件日志、按大小 / 时间轮转及分阶段采样
+"""
+
+import sys
+import json
+import queue
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Dict
+from config import Config
+
+# LogRecord 自带的属性，JSON 输出时只额外输出不在其中的 extra 字段
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON 格式化类，每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        格式化日志记录
+
+        Args:
+            record (logging.LogRecord): 日志记录
+
+        Returns:
+            str: 一行 JSON
+        """
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        # 通过 logger.info(..., extra={...}) 传入的结构化字段
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StageSamplingFilter(logging.Filter):
+    """分阶段采样过滤类，按 logger 名称（阶段）对 INFO 及以下日志每 N 条保留 1 条，WARNING 及以上全部保留"""
+
+    def __init__(self, rates: Dict[str, int]):
+        """
+        初始化采样过滤器
+
+        Args:
+            rates (Dict[str, int]): 阶段（logger 名称）-> 采样间隔 N
+        """
+        super().__init__()
+        self.rates = rates
+        self.seen: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        判断是否保留日志记录
+
+        Args:
+            record (logging.LogRecord): 日志记录
+
+        Returns:
+            bool: 是否保留
+        """
+        rate = self.rates.get(record.name, 1)
+        if rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            count = self.seen.get(record.name, 0)
+            self.seen[record.name] = count + 1
+            if count % rate == 0:
+                return True
+            self.suppressed[record.name] = self.suppressed.get(record.name, 0) + 1
+            return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列日志处理类，队列满时丢弃日志并计数，保证调用方永不阻塞"""
+
+    def __init__(self, log_queue: queue.Queue):
+        """
+        初始化队列日志处理器
+
+        Args:
+            log_queue (queue.Queue): 日志队列
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        """将日志记录放入队列，队列已满时丢弃"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """队列监听类，停止时阻塞等待队列腾出空间再放入结束标记，避免有界队列已满时抛出 queue.Full"""
+
+    def enqueue_sentinel(self):
+        """放入结束标记，最多等待 Config.LOG_STOP_TIMEOUT 秒"""
+        self.queue.put(self._sentinel, timeout=Config.LOG_STOP_TIMEOUT)
+
+
+def create_file_handler(path: str) -> logging.Handler:
+    """
+    按配置创建带轮转的文件日志处理器
+
+    Args:
+        path (str): 日志文件路径
+
+    Returns:
+        logging.Handler: 文件日志处理器
+    """
+    if Config.LOG_ROTATION == "time":
+        handler = TimedRotatingFileHandler(
+            path, when=Config.LOG_ROTATE_WHEN, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = RotatingFileHandler(
+            path, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+
+    if Config.LOG_JSON:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(Config.LOG_FORMAT))
+    return handler
+
+
+class AsyncLogging:
+    """异步日志类，业务线程只把日志放入队列，由后台线程负责控制台和文件输出"""
+
+    def __init__(self, sampling: bool = None):
+        """
+        初始化异步日志
+
+        Args:
+            sampling (bool): 是否启用分阶段采样，默认使用 Config.LOG_SAMPLING_ENABLED
+        """
+        if sampling is None:
+            sampling = Config.LOG_SAMPLING_ENABLED
+
+        self.queue: queue.Queue = queue.Queue(Config.LOG_QUEUE_SIZE)
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.sampler = StageSamplingFilter(Config.LOG_SAMPLE_RATES) if sampling else None
+        if self.sampler is not None:
+            self.queue_handler.addFilter(self.sampler)
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter(Config.LOG_FORMAT))
+        self.listener = DrainingQueueListener(self.queue, console, create_file_handler(Config.LOG_FILE),
+                                              respect_handler_level=True)
+        self.original_handlers = []
+
+    def start(self):
+        """把队列处理器安装到根 logger 并启动后台输出线程"""
+        root = logging.getLogger()
+        self.original_handlers = list(root.handlers)
+        for handler in self.original_handlers:
+            root.removeHandler(handler)
+        root.setLevel(getattr(logging, Config.LOG_LEVEL))
+        root.addHandler(self.queue_handler)
+        self.listener.start()
+
+    def stop(self):
+        """输出采样 / 丢弃统计，刷新队列中剩余日志并停止后台线程，之后的日志恢复同步输出"""
+        logger = logging.getLogger(__name__)
+        if self.sampler is not None and self.sampler.suppressed:
+            logger.info(f"日志采样省略: {self.sampler.suppressed}")
+        if self.queue_handler.dropped:
+            logger.warning(f"日志队列已满，丢弃 {self.queue_handler.dropped} 条日志")
+
+        # 先换回原有处理器，停止后（包括 atexit 中）的日志不再进入无人消费的队列
+        root = logging.getLogger()
+        root.removeHandler(self.queue_handler)
+        restored = self.original_handlers
+        if not restored:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(logging.Formatter(Config.LOG_FORMAT))
+            restored = [console]
+        for handler in restored:
+            root.addHandler(handler)
+
+        try:
+            self.listener.stop()
+        except queue.Full:
+            sys.stderr.write("日志队列在停止超时内仍未腾出空间，剩余日志未能全部输出\n")
+            return
+        for handler in self.listener.handlers:
+            handler.close()
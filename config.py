@@ -23,13 +23,167 @@ class Config:
     PARKING_COUNT_REGION = (50, 140, 150, 180)  # 剩余车位数字识别区域 (x1, y1, x2, y2)
     OCR_CONFIDENCE_THRESHOLD = 0.7  # OCR 识别置信度阈值
     
+    # 多方案竞速识别配置：一次识别失败（或置信度不足）时并发尝试多种方案
+    OCR_RACE_MODE = "fallback"  # "off" 关闭，"fallback" 失败时竞速，"always" 每次都竞速
+    OCR_RACE_VARIANTS = [  # 每个方案覆盖的预处理 / OCR 参数（其余沿用当前参数）
+        {"psm": 7},
+        {"psm": 13},
+        {"psm": 8, "scale": 4},
+        {"psm": 7, "block_size": 21, "c": 4},
+        {"psm": 8, "blur_kernel": 0},
+    ]
+    OCR_RACE_WORKERS = 4  # 竞速线程数
+    OCR_RACE_TIMEOUT = 2.0  # 竞速总超时（秒），同时作为单个 Tesseract 进程的超时
+    
+    # 图像预处理 / OCR 参数（可被调优结果 OCR_PROFILE_PATH 覆盖）
+    OCR_BLUR_KERNEL = 3  # 高斯模糊核大小（奇数，0 表示不模糊）
+    OCR_THRESH_BLOCK_SIZE = 11  # 自适应阈值邻域大小（奇数）
+    OCR_THRESH_C = 2  # 自适应阈值常数 C
+    OCR_SCALE_FACTOR = 3  # ROI 放大倍数
+    OCR_PSM = 8  # Tesseract 页面分割模式 --psm
+    OCR_PROFILE_PATH = "ocr_profile.json"  # 调优后的参数文件，启动时自动加载
+    
+    # 参数调优配置（--mode tune）
+    TUNE_SAMPLES_DIR = "tune_samples"  # 已标注 ROI 截图目录（文件名以数字标签开头，如 12_xxx.png）
+    TUNE_ACCURACY_TOLERANCE = 0.0  # 允许相对最高准确率的下降幅度，用于在帕累托前沿中选最快方案
+    
+    # 多车场 / 多时段监控配置，一次截图、一次识别覆盖全部区域
+    # 每项: {"name": 名称, "region": (x1, y1, x2, y2), "book_coords": (x, y),
+    #        "priority": 优先级（越小越优先）, "min_count": 至少剩余多少个才预订,
+    #        "api_id": HTTP 数据源中的车场标识（可选，默认与名称相同）}
+    # 为空时使用 PARKING_COUNT_REGION 和 BOOK_NOW_BUTTON_COORDS 作为单一车场
+    PARKING_LOTS = []
+    OCR_BATCH_PADDING = 10  # 多区域拼接识别时每个区域上下的填充像素
+    
+    # 车位数据源配置
+    # "screenshot": 进入页面截图并 OCR 识别；"http": 直接轮询接口，只在发现车位后才操作界面；
+    # "agent": 设备端代理监控车位区域，只在区域像素变化时回传并重新识别
+    AVAILABILITY_SOURCE = "screenshot"
+    HTTP_SOURCE_URL = "http://127.0.0.1:8766/api/lots"  # 车位接口地址，可含 {lot}（替换为车场 api_id）
+    # 车位数在 JSON 响应中的路径: 以 "." 分隔，数字为列表下标，"key[field=value]" 按字段选取列表元素，
+    # 可含 {lot}；如 "lots.{lot}.available" 或 "data.items[id={lot}].remain"
+    HTTP_COUNT_PATH = "lots.{lot}.available"
+    HTTP_SOURCE_HEADERS = {}  # 额外请求头（如 Cookie / Authorization）
+    HTTP_CONNECT_TIMEOUT = 2  # 建立连接超时（秒）
+    HTTP_READ_TIMEOUT = 3  # 读取响应超时（秒）
+    HTTP_POOL_SIZE = 4  # 连接池大小，连接保持复用
+    
+    # 设备端代理配置（AVAILABILITY_SOURCE = "agent"）
+    AGENT_REMOTE_PATH = "/data/local/tmp/parking_agent.sh"  # 代理脚本在设备上的路径
+    AGENT_POLL_INTERVAL = 0.2  # 代理两次截屏之间的间隔（秒）
+    # 代理每多少次循环输出一次心跳（每条只有几个字节）；进入页面后要等到两次心跳才采用代理上报，
+    # 调大会相应延长每次读取的等待
+    AGENT_HEARTBEAT_LOOPS = 1
+    AGENT_START_TIMEOUT = 10  # 等待代理首次上报全部区域的超时（秒）
+    AGENT_FRESH_TIMEOUT = 3  # 进入页面后等待代理上报新一轮截屏的最长时间（秒），超时改用截图识别
+    AGENT_STALE_HEARTBEATS = 5  # 超过实测心跳间隔的多少倍没有任何输出时视为代理失去响应并重启
+    AGENT_START_FAILURES = 3  # 代理连续启动失败多少次后暂停启动、改用截图识别
+    AGENT_RETRY_COOLDOWN = 300  # 暂停启动代理后多久再试一次（秒）
+    
+    # 本地模拟车位接口配置（--mode mock-api / bench-http）
+    MOCK_API_HOST = "127.0.0.1"
+    MOCK_API_PORT = 8766
+    MOCK_API_RELEASE_INTERVAL = 30  # 平均多少秒随机释放一次车位（0 表示不自动释放）
+    MOCK_API_RELEASE_DURATION = 5  # 释放的车位保持多少秒后被抢光
+    MOCK_API_LATENCY = 0.0  # 每个请求模拟的服务端处理延迟（秒）
+    
     # 截图配置
     SCREENSHOT_PATH = "temp_screenshot.png"
+    # 截图方式: "pull"（设备保存后拉取）、"exec-out"（直接读取 PNG）、"raw"（直接读取未压缩像素），
+    # "auto" 使用设备清单中探测到的最快方式，清单中没有该设备时使用 "pull"
+    CAPTURE_BACKEND = "auto"
+    
+    # 设备发现配置（--mode discover）
+    DEVICE_INVENTORY_PATH = "device_inventory.json"  # 设备清单文件，保存各设备探测结果
+    DISCOVERY_HOSTS = ["127.0.0.1"]  # 扫描的主机
+    # 扫描的端口范围 (起始, 结束（不含）, 步长)
+    DISCOVERY_PORT_RANGES = [
+        (5555, 5587, 2),  # 官方模拟器 / 雷电 / 蓝叠
+        (7555, 7556, 1),  # MuMu 6
+        (16384, 16704, 32),  # MuMu 12 多开
+        (62001, 62002, 1),  # 夜神
+        (62025, 62057, 1),  # 夜神多开
+    ]
+    DISCOVERY_CONNECT_TIMEOUT = 0.3  # 端口探测超时（秒）
+    DISCOVERY_WORKERS = 32  # 并发探测线程数
+    DISCOVERY_CACHE_TTL = 24 * 3600  # 设备清单中的探测结果有效期（秒），期内不重复探测
+    
+    # 时间线存储配置
+    TIMELINE_ENABLED = True  # 是否把每次识别到的车位数追加到时间线文件
+    TIMELINE_PATH = "parking_timeline.bin"  # 时间线数据文件（设备 / 车场名称映射保存在同名 .names.json）
     
     # 日志配置
     LOG_LEVEL = "INFO"
-    LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+    LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"  # 控制台日志格式
+    LOG_FILE = "parking_grabber.log"  # 日志文件路径
+    LOG_JSON = True  # 文件日志是否使用 JSON 行格式
+    LOG_ROTATION = "size"  # 日志轮转方式: "size" 按大小，"time" 按时间
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # 按大小轮转时单个日志文件上限（字节）
+    LOG_ROTATE_WHEN = "midnight"  # 按时间轮转时的周期（同 TimedRotatingFileHandler 的 when）
+    LOG_BACKUP_COUNT = 5  # 保留的历史日志文件数
+    LOG_QUEUE_SIZE = 10000  # 日志队列容量，队列满时丢弃日志而不阻塞抢占循环
+    LOG_STOP_TIMEOUT = 5  # 停止时等待队列腾出空间放入结束标记的最长时间（秒）
+    LOG_SAMPLING_ENABLED = False  # 是否启用分阶段采样（也可用 --log-sampling 开启）
+    # 分阶段采样间隔: logger 名称 -> 每 N 条 INFO 日志保留 1 条（WARNING 及以上始终保留）
+    LOG_SAMPLE_RATES = {
+        "adb_controller": 20,
+        "image_recognizer": 10,
+        "parking_grabber": 5,
+    }
     
     # 重试配置
     MAX_RETRY_ATTEMPTS = 3  # 最大重试次数
-    RETRY_DELAY = 5  # 重试间隔时间（秒）
\ No newline at end of file
+    RETRY_DELAY = 1  # 退避基准时间（秒），第 n 次重试前随机等待 [0, RETRY_DELAY * 2^(n-1)]
+    RETRY_MAX_DELAY = 8  # 单次退避上限（秒）
+    
+    # ADB 调用超时与熔断配置
+    ADB_COMMAND_TIMEOUT = 5  # 普通 shell 命令超时（秒）
+    ADB_TRANSFER_TIMEOUT = 10  # 截图 / 文件传输 / 连接超时（秒）
+    CYCLE_DEADLINE = 30  # 单个检查周期内所有 ADB 调用的总截止时间（秒）
+    BREAKER_FAILURE_THRESHOLD = 3  # 连续失败多少次后熔断
+    BREAKER_RESET_TIMEOUT = 15  # 熔断后多久放行一次试探调用（秒）
+    RECONNECT_TIMEOUT = 3  # 熔断时快速重连的超时（秒）
+    
+    # 设备看门狗配置
+    WATCHDOG_ENABLED = True  # 是否启用后台心跳看门狗
+    HEARTBEAT_INTERVAL = 5  # 心跳间隔（秒）
+    HEARTBEAT_TIMEOUT = 2  # 单次心跳等待回显的超时（秒）
+    HEARTBEAT_MISS_LIMIT = 2  # 连续丢失多少次心跳后开始恢复
+    RECOVERY_POLL_INTERVAL = 2  # 恢复期间检查设备状态的间隔（秒）
+    
+    # 定时抢占配置（--mode strike）
+    STRIKE_LEAD_TIME = 10  # 释放前多少秒进行最后一次校时并预先进入车位页面
+    STRIKE_SPIN_WINDOW = 0.02  # 到点前最后多少秒改为忙等，减少休眠唤醒误差
+    STRIKE_FIRE_OFFSET = 0.0  # 触发时刻相对释放时刻的偏移（秒），负数表示提前，可用于抵消点击延迟
+    STRIKE_SETTLE_DELAY = 0.5  # 定时抢占中返回 / 点击后的等待时间（秒）
+    STRIKE_RETRY_DURATION = 10  # 到点后未发现车位时持续刷新的时长（秒）
+    CLOCK_SYNC_SAMPLES = 7  # 时钟同步采样次数，取往返最快的一次
+    
+    # 性能分析配置（--mode profile）
+    PROFILE_OUTPUT_PREFIX = "profile"  # 输出文件前缀
+    PROFILE_SAMPLE_INTERVAL = 0.005  # 折叠栈采样间隔（秒）
+    PROFILE_TOP_N = 30  # 热点报告中列出的函数数量
+    
+    # 集群协调配置：多台主机 / 多个进程共享预订租约、车位观测结果和错开的轮询时隙
+    FLEET_ENABLED = False  # 是否启用集群协调
+    FLEET_STORE = "sqlite"  # 协调存储: "sqlite"（同一台主机）或 "redis"（多台主机）
+    FLEET_WORKER_ID = None  # 本节点标识，None 表示使用 "主机名:进程号"
+    FLEET_KEY_PREFIX = "parking:"  # 协调数据的键前缀
+    FLEET_SQLITE_PATH = "fleet.db"  # SQLite 数据库文件
+    FLEET_REDIS_HOST = "127.0.0.1"
+    FLEET_REDIS_PORT = 6380  # 默认使用迷你 Redis（--mode mini-redis）的端口，真实 Redis 通常为 6379
+    FLEET_REDIS_DB = 0
+    FLEET_REDIS_PASSWORD = None
+    FLEET_REDIS_TIMEOUT = 2  # Redis 连接 / 读写超时（秒）
+    FLEET_HEARTBEAT_TTL = 180  # 节点心跳有效期（秒），超过未上报的节点不再参与时隙划分
+    # 其他节点的观测结果在多少秒内可直接使用，免去本节点识别；None 表示取相邻时隙间隔
+    # （WAIT_BETWEEN_CHECKS / 存活节点数）的 FLEET_OBSERVATION_SLOT_FRACTION。
+    # 固定值不小于时隙间隔时，后续节点会一直沿用前一节点的结果，集群每个有效期只真正轮询一次
+    FLEET_OBSERVATION_MAX_AGE = None
+    FLEET_OBSERVATION_SLOT_FRACTION = 0.5
+    FLEET_LEASE_TTL = 60  # 预订租约有效期（秒），持有者异常退出后自动释放
+    FLEET_BOOKED_TTL = 3600  # 预订成功记录保留时长（秒），期间其他节点停止抢占
+    
+    # 守护进程配置（--mode daemon）
+    DAEMON_HOST = "127.0.0.1"  # 控制接口只监听本机
+    DAEMON_PORT = 8765  # 控制接口端口
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+周期性能分析 - 在 cProfile / tracemalloc 下运行若干抢占周期，输出热点报告、内存峰值和折叠调用栈
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from adb_controller import ADBController
+from config import Config
+from lot_registry import ParkingLot
+from parking_grabber import ParkingGrabber
+
+
+class ReplayADBController(ADBController):
+    """回放 ADB 控制器类，按顺序提供录制好的截图，点击和按键不做任何操作"""
+
+    def __init__(self, screenshot_dir: str):
+        """
+        初始化回放控制器
+
+        Args:
+            screenshot_dir (str): 录制截图目录
+        """
+        super().__init__()
+        self.device_id = f"replay:{screenshot_dir}"
+        self.screenshots = sorted(
+            path for ext in ("*.png", "*.jpg", "*.jpeg")
+            for path in glob.glob(os.path.join(screenshot_dir, ext))
+        )
+        self.index = 0
+
+    def connect_device(self) -> bool:
+        """回放模式无需连接设备"""
+        return bool(self.screenshots)
+
+    def get_device_state(self) -> Optional[str]:
+        """回放模式设备始终在线"""
+        return "device"
+
+    def click(self, x: int, y: int, deadline=None) -> bool:
+        """回放模式点击不做任何操作"""
+        return True
+
+    def press_back(self, deadline=None) -> bool:
+        """回放模式按键不做任何操作"""
+        return True
+
+    def take_screenshot(self, save_path: str = None, deadline=None) -> bool:
+        """
+        循环提供下一张录制截图
+
+        Args:
+            save_path (str): 保存路径，默认使用配置中的路径
+
+        Returns:
+            bool: 是否成功
+        """
+        if not self.screenshots:
+            return False
+        source = self.screenshots[self.index % len(self.screenshots)]
+        self.index += 1
+        shutil.copyfile(source, save_path or Config.SCREENSHOT_PATH)
+        return True
+
+
+class StackSampler(threading.Thread):
+    """调用栈采样类，定时采样所有线程（竞速识别线程池等）的调用栈，生成火焰图工具可读的折叠栈"""
+
+    def __init__(self, interval: float = None):
+        """
+        初始化采样器
+
+        Args:
+            interval (float): 采样间隔（秒），默认使用 Config.PROFILE_SAMPLE_INTERVAL
+        """
+        super().__init__(name="StackSampler", daemon=True)
+        self.interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+        self.stacks: Counter = Counter()
+        self.active = threading.Event()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """采样主循环，仅在 active 置位期间采样，每个栈以线程名称为根帧"""
+        while not self._stop_event.wait(self.interval):
+            if not self.active.is_set():
+                continue
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if names:
+                    names.append(thread_names.get(thread_id, str(thread_id)))
+                    self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        """停止采样"""
+        self._stop_event.set()
+
+    def write_collapsed(self, path: str):
+        """
+        写出折叠栈文件（每行 "栈帧;栈帧;... 次数"，可直接用于 flamegraph.pl / speedscope）
+
+        Args:
+            path (str): 输出路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class WorkerProfiles:
+    """工作线程性能分析类，为分析期间新启动的线程（如竞速识别线程池）各自启用一个 cProfile，结束后与主线程合并"""
+
+    def __init__(self):
+        """初始化工作线程分析"""
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _start_thread_profile(self, frame, event, arg):
+        """新线程的第一个 profile 事件：改为由该线程自己的 cProfile 接管"""
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 起 cProfile 基于 sys.monitoring，主线程的分析器已覆盖所有线程
+            return
+        with self._lock:
+            self.profiles.append(profile)
+
+    def start(self):
+        """之后启动的线程都会启用自己的分析器"""
+        threading.setprofile(self._start_thread_profile)
+
+    def stop(self):
+        """不再为新线程启用分析器（已有线程的分析随线程结束而停止）"""
+        threading.setprofile(None)
+
+
+class CycleProfiler:
+    """周期性能分析类，对真实设备或录制截图运行抢占周期并输出分析结果"""
+
+    def __init__(self, replay_dir: str = None, output_prefix: str = None, allow_booking: bool = False):
+        """
+        初始化性能分析器
+
+        Args:
+            replay_dir (str): 录制截图目录，None 表示使用真实设备
+            output_prefix (str): 输出文件前缀，默认使用 Config.PROFILE_OUTPUT_PREFIX
+            allow_booking (bool): 是否允许真正点击"立即预订"，默认只演练到选出车场为止
+        """
+        self.replay_dir = replay_dir
+        self.output_prefix = output_prefix or Config.PROFILE_OUTPUT_PREFIX
+        self.allow_booking = allow_booking
+        self.logger = logging.getLogger(__name__)
+
+    def _create_grabber(self) -> ParkingGrabber:
+        """创建被分析的抢占器，回放模式下替换 ADB 控制器并关闭时间线记录，默认替换预订操作为演练"""
+        grabber = ParkingGrabber()
+        if self.replay_dir:
+            grabber.adb = ReplayADBController(self.replay_dir)
+            grabber.timeline = None
+        if not self.allow_booking:
+            # 演练模式不参与集群协调，避免占用租约或向其他节点共享观测
+            grabber.fleet = None
+
+            def dry_run_booking(lot: ParkingLot) -> bool:
+                self.logger.info(f"演练模式: 跳过预订 {lot.name}，返回上一页")
+                grabber._go_back()
+                return False
+
+            grabber._book_parking = dry_run_booking
+        return grabber
+
+    def run(self, cycles: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        运行 N 个抢占周期并输出热点报告、每周期内存峰值和折叠栈
+
+        回放模式下点击 / 页面等待时间置为 0，只分析截图处理与识别本身的开销。
+        未指定 allow_booking 时发现车位也不会点击"立即预订"，每个周期都完整运行到选出车场后返回。
+
+        Args:
+            cycles (int): 周期数
+
+        Returns:
+            Optional[Dict[str, Any]]: 分析摘要，无法开始时返回 None
+        """
+        grabber = self._create_grabber()
+        if not grabber.adb.connect_device():
+            self.logger.error("无法连接设备或回放目录中没有截图")
+            return None
+
+        saved_delays = (Config.CLICK_DELAY, Config.PAGE_LOAD_DELAY)
+        if self.replay_dir:
+            Config.CLICK_DELAY = Config.PAGE_LOAD_DELAY = 0
+
+        # 提前加载 OCR 依赖，避免首个周期被导入耗时主导
+        grabber.recognizer.warm_up()
+        # 竞速识别线程池在分析期间重新创建，使其工作线程也被分析
+        self._reset_race_pool(grabber)
+
+        profiler = cProfile.Profile()
+        workers = WorkerProfiles()
+        workers.start()
+        sampler = StackSampler()
+        sampler.start()
+        tracemalloc.start()
+        per_cycle: List[Dict[str, Any]] = []
+
+        try:
+            for index in range(1, cycles + 1):
+                tracemalloc.reset_peak()
+                sampler.active.set()
+                start = time.perf_counter()
+                profiler.enable()
+                booked = grabber._attempt_booking()
+                profiler.disable()
+                elapsed = time.perf_counter() - start
+                sampler.active.clear()
+                _, peak = tracemalloc.get_traced_memory()
+
+                per_cycle.append({"cycle": index, "ms": elapsed * 1000, "peak_kb": peak / 1024, "booked": booked})
+                self.logger.info(f"周期 {index}/{cycles}: 耗时 {elapsed * 1000:.1f}ms，内存峰值 {peak / 1024:.1f}KB")
+        finally:
+            tracemalloc.stop()
+            sampler.stop()
+            workers.stop()
+            # 等工作线程退出后再汇总，避免读取仍在更新的分析数据
+            self._reset_race_pool(grabber)
+            grabber.source.close()
+            Config.CLICK_DELAY, Config.PAGE_LOAD_DELAY = saved_delays
+
+        return self._write_reports(profiler, workers.profiles, sampler, per_cycle)
+
+    @staticmethod
+    def _reset_race_pool(grabber: ParkingGrabber):
+        """关闭竞速识别线程池并等待其线程退出，下次竞速时重新创建"""
+        pool = grabber.recognizer._race_pool
+        if pool is not None:
+            pool.shutdown(wait=True)
+            grabber.recognizer._race_pool = None
+
+    def _write_reports(self, profiler: cProfile.Profile, worker_profiles: List[cProfile.Profile],
+                       sampler: StackSampler, per_cycle: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并主线程与工作线程的分析结果，写出 pstats、热点文本报告、每周期指标和折叠栈"""
+        prefix = self.output_prefix
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, *worker_profiles, stream=report)
+        stats.dump_stats(f"{prefix}.pstats")
+        stats.strip_dirs()
+        report.write("=== 按自身耗时排序 ===\n")
+        stats.sort_stats("tottime").print_stats(Config.PROFILE_TOP_N)
+        report.write("=== 按累计耗时排序 ===\n")
+        stats.sort_stats("cumulative").print_stats(Config.PROFILE_TOP_N)
+        with open(f"{prefix}_hotspots.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+
+        with open(f"{prefix}_cycles.json", "w", encoding="utf-8") as f:
+            json.dump(per_cycle, f, indent=2, ensure_ascii=False)
+
+        sampler.write_collapsed(f"{prefix}.collapsed")
+
+        timings = sorted(c["ms"] for c in per_cycle)
+        summary = {
+            "cycles": len(per_cycle),
+            "median_ms": timings[len(timings) // 2] if timings else 0,
+            "max_ms": timings[-1] if timings else 0,
+            "max_peak_kb": max((c["peak_kb"] for c in per_cycle), default=0),
+            "samples": sum(sampler.stacks.values()),
+            "profiled_threads": 1 + len(worker_profiles),
+            "outputs": [f"{prefix}.pstats", f"{prefix}_hotspots.txt", f"{prefix}_cycles.json", f"{prefix}.collapsed"],
+        }
+        self.logger.info(
+            f"性能分析完成: {summary['cycles']} 个周期，中位耗时 {summary['median_ms']:.1f}ms，"
+            f"最大内存峰值 {summary['max_peak_kb']:.1f}KB，输出文件: {', '.join(summary['outputs'])}"
+        )
+        return summary
@@ -0,0 +1,371 @@
+"""
+设备端监控代理 - 在设备上循环截屏并只对车位区域计算哈希，仅在区域像素变化时把该区域回传主机
+"""
+
+import os
+import time
+import base64
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from lot_registry import ParkingLot
+from parking_grabber import AvailabilitySource, ScreenshotSource
+from retry_policy import CircuitBreaker
+
+# 设备端脚本（toybox / mksh 即可运行）
+# 参数: 轮询间隔 像素数据偏移（以 4 字节像素为单位） 屏幕宽度 心跳间隔（循环次数） 区域...（每个区域 4 个数 x1 y1 x2 y2）
+# 输出: "CHANGE <区域序号> <md5> <区域像素 base64>"、"ALIVE <循环次数>"、"ERROR <原因>"
+AGENT_SCRIPT = """#!/system/bin/sh
+INTERVAL=$1; BASE=$2; WIDTH=$3; BEAT=$4; shift 4
+REGIONS="$*"
+FRAME="$0.raw"
+LOOP=0
+echo "READY $$"
+while true; do
+  if ! screencap > "$FRAME" 2>/dev/null; then
+    echo "ERROR screencap"; sleep 1; continue
+  fi
+  set -- $REGIONS
+  i=0
+  while [ $# -ge 4 ]; do
+    x1=$1; y1=$2; x2=$3; y2=$4; shift 4
+    y=$y1
+    while [ $y -lt $y2 ]; do
+      dd if="$FRAME" bs=4 skip=$((BASE + y * WIDTH + x1)) count=$((x2 - x1)) 2>/dev/null
+      y=$((y + 1))
+    done > "$FRAME.$i"
+    HASH=$(md5sum < "$FRAME.$i"); HASH=${HASH%% *}
+    eval "PREV=\\$PREV_$i"
+    if [ "$HASH" != "$PREV" ]; then
+      eval "PREV_$i=$HASH"
+      echo "CHANGE $i $HASH $(base64 -w 0 < "$FRAME.$i")"
+    fi
+    i=$((i + 1))
+  done
+  LOOP=$((LOOP + 1))
+  [ $((LOOP % BEAT)) -eq 0 ] && echo "ALIVE $LOOP"
+  sleep "$INTERVAL"
+done
+"""
+
+
+class DeviceAgent:
+    """设备端代理类，推送并启动代理脚本，在后台线程中接收区域变化"""
+
+    def __init__(self, adb):
+        """
+        初始化设备端代理
+
+        Args:
+            adb (ADBController): 目标设备的 ADB 控制器
+        """
+        self.adb = adb
+        self.device_id: Optional[str] = None
+        self.logger = logging.getLogger(__name__)
+        self.process: Optional[subprocess.Popen] = None
+        # 启动时各车场的 (名称, 区域)，区域序号按此顺序
+        self.regions: List[Tuple[str, Tuple[int, int, int, int]]] = []
+        # 车场名称 -> (区域 md5, 区域 BGR 图像, 收到时间)
+        self.latest: Dict[str, Tuple[str, object, float]] = {}
+        self.last_alive = 0.0
+        # 最近几次心跳的接收时间（time.monotonic），用于估计心跳间隔和判断上报是否足够新
+        self.heartbeats: deque = deque(maxlen=10)
+        self.stats = {"changes": 0, "bytes": 0, "restarts": 0}
+        self._lock = threading.Lock()
+        self._heartbeat = threading.Condition(self._lock)
+        self._first_frame = threading.Event()
+
+    def _frame_geometry(self) -> Optional[Tuple[int, int]]:
+        """
+        读取一帧 raw 截图，得到屏幕宽度和像素数据偏移
+
+        Returns:
+            Optional[Tuple[int, int]]: (屏幕宽度, 像素数据偏移（字节）)，失败时返回 None
+        """
+        data = self.adb.capture_bytes(raw=True)
+        if data is None:
+            return None
+        header = self.adb.parse_raw_header(data)
+        if header is None:
+            self.logger.error("设备不支持 4 字节像素格式的 raw 截图，无法使用设备端代理")
+            return None
+        width, _, _, offset = header
+        return width, offset
+
+    def _install(self) -> bool:
+        """把代理脚本推送到设备"""
+        local = os.path.join(tempfile.gettempdir(), "parking_agent.sh")
+        with open(local, "w", encoding="utf-8", newline="\n") as f:
+            f.write(AGENT_SCRIPT)
+        return self.adb.push_file(local, Config.AGENT_REMOTE_PATH)
+
+    def is_alive(self) -> bool:
+        """
+        判断代理是否在运行且仍针对当前设备和车场
+
+        Returns:
+            bool: 是否可用
+        """
+        return self.process is not None and self.process.poll() is None and self.device_id == self.adb.device_id
+
+    def start(self, lots: List[ParkingLot]) -> bool:
+        """
+        推送并启动代理，等待首次上报全部区域
+
+        Args:
+            lots (List[ParkingLot]): 监控的车场
+
+        Returns:
+            bool: 启动是否成功
+        """
+        self.stop()
+        geometry = self._frame_geometry()
+        if geometry is None or not self._install():
+            return False
+
+        width, offset = geometry
+        regions = [str(v) for lot in lots for v in lot.region]
+        command = [
+            "adb", "-s", self.adb.device_id, "shell", "sh", Config.AGENT_REMOTE_PATH,
+            str(Config.AGENT_POLL_INTERVAL), str(offset // 4), str(width), str(Config.AGENT_HEARTBEAT_LOOPS),
+        ] + regions
+
+        try:
+            self.process = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, bufsize=1
+            )
+        except Exception as e:
+            self.logger.error(f"启动设备端代理失败: {e}")
+            self.process = None
+            return False
+
+        self.device_id = self.adb.device_id
+        self.regions = [(lot.name, tuple(lot.region)) for lot in lots]
+        with self._lock:
+            self.latest = {}
+            self.heartbeats.clear()
+        self.last_alive = time.monotonic()
+        self._first_frame.clear()
+        # 区域序号只对启动该进程时的车场列表有效，读取线程与进程、车场列表绑定
+        threading.Thread(target=self._read_output, args=(self.process, self.regions), name="DeviceAgentReader",
+                         daemon=True).start()
+
+        if not self._first_frame.wait(Config.AGENT_START_TIMEOUT):
+            self.logger.error("设备端代理在超时时间内没有上报区域像素")
+            self.stop()
+            return False
+
+        self.logger.info(f"设备端代理已启动: {self.device_id}，监控 {len(self.regions)} 个区域")
+        return True
+
+    def _read_output(self, process: subprocess.Popen, regions: List[Tuple[str, Tuple[int, int, int, int]]]):
+        """读取代理输出并解码变化的区域，代理被替换后丢弃旧进程剩余的输出"""
+        import cv2
+        import numpy as np
+
+        for line in process.stdout:
+            if process is not self.process:
+                break
+            kind, _, rest = line.strip().partition(" ")
+            self.last_alive = time.monotonic()
+
+            if kind == "CHANGE":
+                try:
+                    index, digest, payload = rest.split(" ", 2)
+                    name, (x1, y1, x2, y2) = regions[int(index)]
+                    data = base64.b64decode(payload)
+                    pixels = np.frombuffer(data, np.uint8).reshape(y2 - y1, x2 - x1, 4)
+                except (ValueError, IndexError) as e:
+                    self.logger.warning(f"无法解析代理上报: {e}")
+                    continue
+
+                with self._lock:
+                    if process is not self.process:
+                        break
+                    self.latest[name] = (digest, cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR), time.time())
+                    self.stats["changes"] += 1
+                    self.stats["bytes"] += len(line)
+                    if len(self.latest) == len(regions):
+                        self._first_frame.set()
+                self.logger.debug(f"区域变化: {name} ({digest[:8]})")
+            elif kind == "ALIVE":
+                with self._heartbeat:
+                    self.heartbeats.append(self.last_alive)
+                    self._heartbeat.notify_all()
+            elif kind == "ERROR":
+                self.logger.warning(f"设备端代理错误: {rest}")
+
+        self.logger.warning("设备端代理已退出")
+
+    def heartbeat_spacing(self) -> Optional[float]:
+        """
+        实测心跳间隔（最近几次中的最大值），包含截屏和逐行读取区域的实际耗时
+
+        Returns:
+            Optional[float]: 心跳间隔（秒），心跳不足两次时返回 None
+        """
+        with self._lock:
+            beats = list(self.heartbeats)
+        if len(beats) < 2:
+            return None
+        return max(later - earlier for earlier, later in zip(beats, beats[1:]))
+
+    def is_stale(self) -> bool:
+        """
+        判断代理是否已失去响应：超过 AGENT_STALE_HEARTBEATS 个实测心跳间隔没有任何输出；
+        尚未测得间隔时按配置估算并额外宽限 AGENT_START_TIMEOUT
+
+        Returns:
+            bool: 是否失去响应
+        """
+        spacing = self.heartbeat_spacing()
+        if spacing is None:
+            limit = Config.AGENT_POLL_INTERVAL * Config.AGENT_HEARTBEAT_LOOPS * Config.AGENT_STALE_HEARTBEATS \
+                + Config.AGENT_START_TIMEOUT
+        else:
+            limit = spacing * Config.AGENT_STALE_HEARTBEATS
+        return time.monotonic() - self.last_alive > limit
+
+    def wait_fresh(self, since: float, timeout: float) -> bool:
+        """
+        等待代理完成一轮在 since 之后才开始的截屏
+
+        两次心跳之间的循环都在前一次心跳输出之后才截屏，因此 since 之后收到第二次心跳时，
+        最近一次上报一定反映 since 之后的屏幕。
+
+        Args:
+            since (float): 时间点（time.monotonic），如进入车位页面的时间
+            timeout (float): 最长等待时间（秒）
+
+        Returns:
+            bool: 是否在超时前等到
+        """
+        with self._heartbeat:
+            return self._heartbeat.wait_for(
+                lambda: sum(1 for beat in self.heartbeats if beat >= since) >= 2, timeout
+            )
+
+    def snapshot(self) -> Dict[str, Tuple[str, object, float]]:
+        """
+        获取各区域最近一次上报的内容
+
+        Returns:
+            Dict[str, Tuple[str, object, float]]: 车场名称 -> (md5, BGR 图像, 收到时间)
+        """
+        with self._lock:
+            return dict(self.latest)
+
+    def stop(self):
+        """停止本机 adb 进程并结束设备上的代理脚本"""
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+        self.process = None
+        # 旧版 adb 不会随本机进程结束而终止设备上的脚本
+        self.adb.kill_process(Config.AGENT_REMOTE_PATH)
+
+
+class DeviceAgentSource(AvailabilitySource):
+    """设备端代理数据源类，区域像素未变化时直接沿用上次识别结果，只在变化时重新 OCR
+
+    代理持续监控当前屏幕，页面仍需由抢占器进入；代理不可用时回退到截图数据源。
+    """
+
+    requires_page = True
+
+    def __init__(self, grabber):
+        """
+        初始化设备端代理数据源
+
+        Args:
+            grabber (ParkingGrabber): 所属抢占器
+        """
+        self.grabber = grabber
+        self.agent = DeviceAgent(grabber.adb)
+        self.fallback = ScreenshotSource(grabber)
+        self.logger = logging.getLogger(__name__)
+        # 车场名称 -> (区域 md5, 识别结果, 置信度)
+        self._results: Dict[str, Tuple[str, Optional[int], float]] = {}
+        # 代理连续启动失败后暂停启动，冷却后再试一次
+        self.breaker = CircuitBreaker(Config.AGENT_START_FAILURES, Config.AGENT_RETRY_COOLDOWN)
+        self.stats = {"reads": 0, "ocr": 0, "reused": 0, "fallbacks": 0, "stale_reads": 0}
+
+    @property
+    def origin(self) -> str:
+        return self.grabber.adb.device_id
+
+    def _ensure_agent(self, lots: List[ParkingLot]) -> bool:
+        """代理未运行、设备或车场变化、失去响应时（重新）启动代理，连续启动失败后暂停一段时间"""
+        self.agent.adb = self.grabber.adb
+        if self.agent.is_alive() and not self.agent.is_stale() and \
+                self.agent.regions == [(lot.name, tuple(lot.region)) for lot in lots]:
+            return True
+
+        if not self.breaker.allow():
+            return False
+
+        if self.agent.process is not None:
+            self.agent.stats["restarts"] += 1
+        self._results = {}
+        if self.agent.start(lots):
+            self.breaker.record_success()
+            return True
+
+        if self.breaker.record_failure():
+            self.logger.warning(
+                f"设备端代理连续启动失败 {self.breaker.consecutive_failures} 次，"
+                f"{Config.AGENT_RETRY_COOLDOWN} 秒内改用截图识别"
+            )
+        return False
+
+    def read(self, lots: List[ParkingLot]) -> Dict[str, Optional[int]]:
+        """使用代理最近上报的区域，哈希与上次相同的车场直接复用识别结果"""
+        self.stats["reads"] += 1
+        if not self._ensure_agent(lots):
+            self.stats["fallbacks"] += 1
+            self.logger.warning("设备端代理不可用，本次使用截图识别")
+            return self.fallback.read(lots)
+
+        # 代理上报可能还是进入页面之前的屏幕
+        if not self.agent.wait_fresh(self.grabber.page_opened_at, Config.AGENT_FRESH_TIMEOUT):
+            self.stats["stale_reads"] += 1
+            self.logger.warning("设备端代理未及时上报当前页面，本次使用截图识别")
+            return self.fallback.read(lots)
+
+        snapshot = self.agent.snapshot()
+        counts = {}
+        for lot in lots:
+            digest, roi, _ = snapshot[lot.name]
+            cached = self._results.get(lot.name)
+            if cached is not None and cached[0] == digest:
+                self.stats["reused"] += 1
+                counts[lot.name] = cached[1]
+                continue
+
+            self.stats["ocr"] += 1
+            value, confidence = self.grabber.recognizer.recognize_count(roi)
+            self._results[lot.name] = (digest, value, confidence)
+            counts[lot.name] = value
+
+        return counts
+
+    def confidence(self, lot_name: str) -> float:
+        cached = self._results.get(lot_name)
+        return cached[2] if cached is not None else float("nan")
+
+    def get_stats(self) -> Dict[str, int]:
+        """读取 / OCR / 复用次数及代理上报统计"""
+        return {**self.stats, **self.agent.stats}
+
+    def close(self):
+        """停止设备端代理"""
+        self.agent.stop()
@@ -0,0 +1,310 @@
+"""
+设备发现 - 并发扫描模拟器端口、解析 adb devices -l，并行探测各设备能力并保存设备清单
+"""
+
+import os
+import re
+import time
+import socket
+import logging
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from adb_controller import ADBController, CAPTURE_BACKENDS
+from config import Config
+from utils import Utils
+
+# getevent -pl 输出中的设备行和坐标轴行
+_GETEVENT_DEVICE = re.compile(r"^add device \d+: (?P<path>\S+)")
+_GETEVENT_NAME = re.compile(r'^\s*name:\s*"(?P<name>.*)"')
+_GETEVENT_AXIS = re.compile(r"(?P<axis>ABS_MT_POSITION_[XY])\s*:.*\bmax (?P<max>\d+)")
+
+
+class DeviceDiscovery:
+    """设备发现类，找出本机可用的模拟器并探测分辨率、触摸输入设备和截图方式"""
+
+    def __init__(self, hosts: List[str] = None, port_ranges: List[Tuple[int, int, int]] = None,
+                 inventory_path: str = None):
+        """
+        初始化设备发现
+
+        Args:
+            hosts (List[str]): 扫描的主机，默认使用 Config.DISCOVERY_HOSTS
+            port_ranges (List[Tuple[int, int, int]]): 端口范围，默认使用 Config.DISCOVERY_PORT_RANGES
+            inventory_path (str): 设备清单路径，默认使用 Config.DEVICE_INVENTORY_PATH
+        """
+        self.hosts = hosts or Config.DISCOVERY_HOSTS
+        self.port_ranges = port_ranges or Config.DISCOVERY_PORT_RANGES
+        self.inventory_path = inventory_path or Config.DEVICE_INVENTORY_PATH
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _adb(args: List[str], timeout: float, binary: bool = False) -> Optional[subprocess.CompletedProcess]:
+        """执行一条 adb 命令，超时或无法执行时返回 None"""
+        try:
+            return subprocess.run(["adb"] + args, capture_output=True, text=not binary, timeout=timeout)
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+
+    def scan_ports(self) -> List[str]:
+        """
+        并发探测端口范围内正在监听的端口
+
+        Returns:
+            List[str]: 可连接的 "主机:端口" 列表
+        """
+        candidates = [
+            (host, port)
+            for host in self.hosts
+            for start, stop, step in self.port_ranges
+            for port in range(start, stop, step)
+        ]
+
+        def is_open(address: Tuple[str, int]) -> bool:
+            try:
+                with socket.create_connection(address, timeout=Config.DISCOVERY_CONNECT_TIMEOUT):
+                    return True
+            except OSError:
+                return False
+
+        with ThreadPoolExecutor(Config.DISCOVERY_WORKERS) as pool:
+            results = pool.map(is_open, candidates)
+            return [f"{host}:{port}" for (host, port), ok in zip(candidates, results) if ok]
+
+    def connect_all(self, serials: List[str]) -> List[str]:
+        """
+        并发执行 adb connect
+
+        Args:
+            serials (List[str]): "主机:端口" 列表
+
+        Returns:
+            List[str]: 连接成功的设备
+        """
+        def connect(serial: str) -> bool:
+            result = self._adb(["connect", serial], Config.ADB_TRANSFER_TIMEOUT)
+            # 已连接时输出 "already connected to"
+            return result is not None and "connected to" in result.stdout
+
+        with ThreadPoolExecutor(Config.DISCOVERY_WORKERS) as pool:
+            results = pool.map(connect, serials)
+            return [serial for serial, ok in zip(serials, results) if ok]
+
+    @staticmethod
+    def parse_devices_list(output: str) -> List[Dict[str, str]]:
+        """
+        解析 adb devices -l 的输出
+
+        Args:
+            output (str): 命令输出，每行形如 "127.0.0.1:5555  device product:x model:y device:z transport_id:1"
+
+        Returns:
+            List[Dict[str, str]]: 设备列表，包含 serial、state 及 product / model 等属性
+        """
+        devices = []
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) < 2 or line.startswith("List of devices") or line.startswith("*"):
+                continue
+            device = {"serial": parts[0], "state": parts[1]}
+            for part in parts[2:]:
+                key, sep, value = part.partition(":")
+                if sep:
+                    device[key] = value
+            devices.append(device)
+        return devices
+
+    def list_devices(self) -> List[Dict[str, str]]:
+        """
+        获取 adb 已知的全部设备
+
+        Returns:
+            List[Dict[str, str]]: 设备列表
+        """
+        result = self._adb(["devices", "-l"], Config.ADB_COMMAND_TIMEOUT)
+        if result is None or result.returncode != 0:
+            self.logger.error("执行 adb devices -l 失败")
+            return []
+        return self.parse_devices_list(result.stdout)
+
+    @staticmethod
+    def parse_wm_size(output: str) -> Optional[List[int]]:
+        """
+        解析 wm size 输出，存在 Override size 时以其为准
+
+        Args:
+            output (str): 命令输出
+
+        Returns:
+            Optional[List[int]]: [宽, 高]，无法解析时返回 None
+        """
+        sizes = dict(re.findall(r"(Physical|Override) size:\s*(\d+x\d+)", output))
+        size = sizes.get("Override") or sizes.get("Physical")
+        return [int(v) for v in size.split("x")] if size else None
+
+    @staticmethod
+    def parse_getevent(output: str) -> Optional[Dict[str, Any]]:
+        """
+        从 getevent -pl 输出中找出多点触摸输入设备
+
+        Args:
+            output (str): 命令输出
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 path、name、max_x、max_y，未找到触摸设备时返回 None
+        """
+        current = None
+        for line in output.splitlines():
+            match = _GETEVENT_DEVICE.match(line)
+            if match:
+                if current and "max_x" in current and "max_y" in current:
+                    return current
+                current = {"path": match["path"], "name": ""}
+                continue
+            if current is None:
+                continue
+            match = _GETEVENT_NAME.match(line)
+            if match:
+                current["name"] = match["name"]
+                continue
+            match = _GETEVENT_AXIS.search(line)
+            if match:
+                current["max_x" if match["axis"].endswith("X") else "max_y"] = int(match["max"])
+
+        if current and "max_x" in current and "max_y" in current:
+            return current
+        return None
+
+    def probe_resolution(self, serial: str) -> Optional[List[int]]:
+        """探测屏幕分辨率"""
+        result = self._adb(["-s", serial, "shell", "wm", "size"], Config.ADB_COMMAND_TIMEOUT)
+        return self.parse_wm_size(result.stdout) if result is not None else None
+
+    def probe_input_device(self, serial: str) -> Optional[Dict[str, Any]]:
+        """探测触摸输入设备"""
+        result = self._adb(["-s", serial, "shell", "getevent", "-pl"], Config.ADB_COMMAND_TIMEOUT)
+        return self.parse_getevent(result.stdout) if result is not None else None
+
+    def probe_capture(self, serial: str) -> Dict[str, Optional[float]]:
+        """
+        依次尝试各截图方式并计时
+
+        Args:
+            serial (str): 设备序列号
+
+        Returns:
+            Dict[str, Optional[float]]: 截图方式 -> 耗时（毫秒），不支持时为 None
+        """
+        timings: Dict[str, Optional[float]] = {}
+        timeout = Config.ADB_TRANSFER_TIMEOUT
+
+        for backend in CAPTURE_BACKENDS:
+            start = time.perf_counter()
+            if backend == "pull":
+                local = os.path.join(tempfile.gettempdir(), f"probe_{serial.replace(':', '_')}.png")
+                ok = all(
+                    result is not None and result.returncode == 0
+                    for result in (
+                        self._adb(["-s", serial, "shell", "screencap", "-p", "/sdcard/screenshot.png"], timeout),
+                        self._adb(["-s", serial, "pull", "/sdcard/screenshot.png", local], timeout),
+                    )
+                )
+                if os.path.exists(local):
+                    os.remove(local)
+            elif backend == "exec-out":
+                result = self._adb(["-s", serial, "exec-out", "screencap", "-p"], timeout, binary=True)
+                ok = result is not None and result.stdout.startswith(b"\x89PNG")
+            else:
+                result = self._adb(["-s", serial, "exec-out", "screencap"], timeout, binary=True)
+                ok = result is not None and ADBController.parse_raw_header(result.stdout) is not None
+            timings[backend] = round((time.perf_counter() - start) * 1000, 1) if ok else None
+
+        return timings
+
+    def probe(self, serial: str, pool: ThreadPoolExecutor) -> Dict[str, Any]:
+        """
+        并行探测一台设备的分辨率、触摸输入设备和截图方式
+
+        Args:
+            serial (str): 设备序列号
+            pool (ThreadPoolExecutor): 探测线程池
+
+        Returns:
+            Dict[str, Any]: 探测结果，capture_backend 为支持的最快截图方式
+        """
+        resolution = pool.submit(self.probe_resolution, serial)
+        input_device = pool.submit(self.probe_input_device, serial)
+        capture = pool.submit(self.probe_capture, serial)
+
+        timings = capture.result()
+        supported = {backend: ms for backend, ms in timings.items() if ms is not None}
+        return {
+            "resolution": resolution.result(),
+            "input_device": input_device.result(),
+            # 点击仍使用 input tap，记录触摸设备供按设备校准坐标
+            "input_backend": "input",
+            "capture": timings,
+            "capture_backend": min(supported, key=supported.get) if supported else None,
+            "probed_at": time.time(),
+        }
+
+    def discover(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        扫描、连接并探测全部设备，结果合并保存到设备清单
+
+        Args:
+            refresh (bool): 是否忽略清单中仍在有效期内的探测结果，重新探测
+
+        Returns:
+            Dict[str, Any]: 设备清单
+        """
+        start = time.perf_counter()
+        inventory = Utils.load_config(self.inventory_path) or {}
+        known = inventory.get("devices", {})
+
+        listening = self.scan_ports()
+        self.logger.info(f"端口扫描完成: {len(listening)} 个端口在监听 {listening}")
+        self.connect_all(listening)
+
+        devices = self.list_devices()
+        online = [d for d in devices if d["state"] == "device"]
+        for device in devices:
+            if device["state"] != "device":
+                self.logger.warning(f"设备不可用: {device['serial']}（{device['state']}）")
+
+        now = time.time()
+        to_probe = [
+            d for d in online
+            if refresh or now - known.get(d["serial"], {}).get("probed_at", 0) > Config.DISCOVERY_CACHE_TTL
+        ]
+
+        # 每台设备 3 个探测任务
+        with ThreadPoolExecutor(max(1, min(Config.DISCOVERY_WORKERS, len(to_probe) * 3))) as pool, \
+                ThreadPoolExecutor(max(1, len(to_probe))) as outer:
+            probes = {d["serial"]: outer.submit(self.probe, d["serial"], pool) for d in to_probe}
+            results = {serial: future.result() for serial, future in probes.items()}
+
+        for device in online:
+            serial = device["serial"]
+            entry = {**known.get(serial, {}), **{k: v for k, v in device.items() if k != "serial"}}
+            entry.update(results.get(serial, {}))
+            known[serial] = entry
+
+        inventory = {"updated_at": datetime.now().isoformat(timespec="seconds"), "devices": known}
+        Utils.save_config(inventory, self.inventory_path)
+
+        self.logger.info(
+            f"设备发现完成，耗时 {time.perf_counter() - start:.1f} 秒: 在线 {len(online)} 台，"
+            f"新探测 {len(to_probe)} 台，清单已保存到 {self.inventory_path}"
+        )
+        for device in online:
+            entry = known[device["serial"]]
+            resolution = "x".join(map(str, entry.get("resolution") or [])) or "未知"
+            touch = (entry.get("input_device") or {}).get("path", "未知")
+            self.logger.info(
+                f"  {device['serial']} {entry.get('model', '')}: 分辨率 {resolution}，触摸设备 {touch}，"
+                f"截图方式 {entry.get('capture_backend') or '不可用'} {entry.get('capture', {})}"
+            )
+        return inventory
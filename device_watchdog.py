@@ -0,0 +1,234 @@
+"""
+设备看门狗 - 通过常驻 shell 通道发送心跳，掉线时主动重连并暂停抢占循环
+"""
+
+import queue
+import logging
+import threading
+import subprocess
+from typing import Optional, List
+from config import Config
+
+
+class ShellChannel:
+    """常驻 adb shell 通道类，复用一个 shell 进程执行轻量命令"""
+
+    def __init__(self, device_id: str):
+        """
+        初始化 shell 通道
+
+        Args:
+            device_id (str): 设备 ID
+        """
+        self.device_id = device_id
+        self.process: Optional[subprocess.Popen] = None
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.sequence = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def open(self) -> bool:
+        """
+        启动 shell 进程及其输出读取线程
+
+        Returns:
+            bool: 启动是否成功
+        """
+        self.close()
+        try:
+            self.process = subprocess.Popen(
+                ["adb", "-s", self.device_id, "shell"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1
+            )
+        except Exception as e:
+            self.logger.error(f"启动常驻 shell 失败: {e}")
+            self.process = None
+            return False
+
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read_output, args=(self.process, self.lines), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _read_output(process: subprocess.Popen, lines: queue.Queue):
+        """读取 shell 输出并放入队列，进程退出时放入 None"""
+        for line in process.stdout:
+            lines.put(line.strip())
+        lines.put(None)
+
+    def is_alive(self) -> bool:
+        """
+        判断 shell 进程是否仍在运行
+
+        Returns:
+            bool: 是否存活
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command: str, timeout: float) -> Optional[List[str]]:
+        """
+        在常驻 shell 中执行命令并收集输出（无需为每条命令启动 adb 进程）
+
+        Args:
+            command (str): shell 命令
+            timeout (float): 等待命令结束的超时时间（秒）
+
+        Returns:
+            Optional[List[str]]: 命令输出行，超时或通道断开时返回 None
+        """
+        with self._lock:
+            return self._run_locked(command, timeout)
+
+    def _run_locked(self, command: str, timeout: float) -> Optional[List[str]]:
+        """在持有锁的情况下执行命令，同一时刻只有一条命令在通道中"""
+        if not self.is_alive():
+            return None
+
+        self.sequence += 1
+        token = f"__done_{self.sequence}__"
+
+        try:
+            self.process.stdin.write(f"{command}; echo {token}\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            return None
+
+        # 丢弃之前超时命令遗留的输出和结束标记，直到收到本次 token
+        output = []
+        while True:
+            try:
+                line = self.lines.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if line is None:
+                return None
+            if line == token:
+                return output
+            if line.startswith("__done_"):
+                output = []
+                continue
+            output.append(line)
+
+    def echo(self, timeout: float) -> bool:
+        """
+        发送一次 echo 心跳并等待回显
+
+        Args:
+            timeout (float): 等待回显的超时时间（秒）
+
+        Returns:
+            bool: 是否在超时内收到回显
+        """
+        return self.run("true", timeout) is not None
+
+    def close(self):
+        """关闭 shell 进程"""
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+        self.process = None
+
+
+class DeviceWatchdog(threading.Thread):
+    """设备看门狗类，后台周期性心跳，异常时暂停设备调用并主动恢复连接"""
+
+    def __init__(self, adb, interval: float = None):
+        """
+        初始化看门狗
+
+        Args:
+            adb (ADBController): 被监控的 ADB 控制器
+            interval (float): 心跳间隔（秒），默认使用 Config.HEARTBEAT_INTERVAL
+        """
+        super().__init__(name="DeviceWatchdog", daemon=True)
+        self.adb = adb
+        self.interval = interval or Config.HEARTBEAT_INTERVAL
+        self.channel = ShellChannel(adb.device_id)
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+        self.missed_heartbeats = 0
+        self.recoveries = 0
+
+    def heartbeat(self) -> bool:
+        """
+        发送一次心跳，通道断开时先尝试重新打开
+
+        Returns:
+            bool: 设备是否响应
+        """
+        if self.channel.device_id != self.adb.device_id:
+            self.channel.device_id = self.adb.device_id
+            self.channel.close()
+
+        if not self.channel.is_alive() and not self.channel.open():
+            return False
+        return self.channel.echo(Config.HEARTBEAT_TIMEOUT)
+
+    def run(self):
+        """看门狗主循环"""
+        self.logger.info(f"设备看门狗已启动，心跳间隔 {self.interval} 秒")
+
+        while not self._stop_event.wait(self.interval):
+            if self.heartbeat():
+                self.missed_heartbeats = 0
+                continue
+
+            self.missed_heartbeats += 1
+            self.logger.warning(f"设备心跳无响应 ({self.missed_heartbeats}/{Config.HEARTBEAT_MISS_LIMIT})")
+
+            if self.missed_heartbeats >= Config.HEARTBEAT_MISS_LIMIT:
+                self._recover()
+
+        self.channel.close()
+        self.logger.info("设备看门狗已停止")
+
+    def _recover(self):
+        """暂停设备调用，按设备状态重连，直到心跳恢复"""
+        self.adb.device_ready.clear()
+        self.recoveries += 1
+        self.logger.warning("设备异常，暂停抢占循环并开始恢复连接")
+
+        while not self._stop_event.is_set():
+            state = self.adb.get_device_state()
+
+            if state == "unauthorized":
+                self.logger.error("设备未授权 ADB 调试，请在模拟器中确认授权")
+            elif state != "device":
+                self.logger.warning(f"设备状态: {state or '未找到'}，尝试重连")
+                self.adb.fast_reconnect()
+            else:
+                self.channel.close()
+
+            if self.heartbeat():
+                break
+
+            self._stop_event.wait(Config.RECOVERY_POLL_INTERVAL)
+
+        self.missed_heartbeats = 0
+        self.adb.policy.breaker.reset()
+        self.adb.device_ready.set()
+        self.logger.info("设备连接已恢复，继续抢占循环")
+
+    def wait_until_healthy(self, timeout: float = None) -> bool:
+        """
+        等待设备恢复可用
+
+        Args:
+            timeout (float): 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 设备是否可用
+        """
+        return self.adb.device_ready.wait(timeout)
+
+    def stop(self):
+        """停止看门狗"""
+        self._stop_event.set()
@@ -0,0 +1,440 @@
+"""
+集群协调 - 多台主机上的抢占器共享预订租约、车位观测结果和错开的轮询时隙
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+
+# 仅当键的值仍为自己持有的值时才删除（释放租约），避免误删已过期后被他人获取的租约
+COMPARE_AND_DELETE_SCRIPT = (
+    'if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) else return 0 end'
+)
+
+
+class CoordinationStore(ABC):
+    """协调存储基类，提供带过期时间的键值操作"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float = None, nx: bool = False) -> bool:
+        """
+        写入键值
+
+        Args:
+            key (str): 键
+            value (str): 值
+            ttl (float): 过期时间（秒），None 表示不过期
+            nx (bool): 为 True 时仅在键不存在（或已过期）时写入
+
+        Returns:
+            bool: 是否写入
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的值，不存在时返回 None"""
+
+    @abstractmethod
+    def delete(self, key: str, value: str = None) -> bool:
+        """
+        删除键
+
+        Args:
+            key (str): 键
+            value (str): 不为 None 时仅在当前值等于该值时删除
+
+        Returns:
+            bool: 是否删除
+        """
+
+    @abstractmethod
+    def keys(self, prefix: str) -> List[str]:
+        """列出指定前缀的未过期键"""
+
+    def close(self):
+        """关闭连接"""
+
+
+class SQLiteStore(CoordinationStore):
+    """SQLite 协调存储类，供同一台主机上的多个抢占器进程共享"""
+
+    def __init__(self, path: str = None):
+        """
+        初始化 SQLite 存储
+
+        Args:
+            path (str): 数据库文件路径，默认使用 Config.FLEET_SQLITE_PATH
+        """
+        self.path = path or Config.FLEET_SQLITE_PATH
+        self._lock = threading.Lock()
+        # 手动管理事务，BEGIN IMMEDIATE 保证 NX 写入在多进程间互斥
+        self.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+
+    def set(self, key: str, value: str, ttl: float = None, nx: bool = False) -> bool:
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM kv WHERE key = ? AND expires <= ?", (key, now))
+                verb = "INSERT OR IGNORE" if nx else "INSERT OR REPLACE"
+                cursor = self.conn.execute(f"{verb} INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                                           (key, value, expires))
+                self.conn.execute("COMMIT")
+                return cursor.rowcount == 1
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, key: str, value: str = None) -> bool:
+        with self._lock:
+            if value is None:
+                cursor = self.conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            else:
+                cursor = self.conn.execute("DELETE FROM kv WHERE key = ? AND value = ?", (key, value))
+        return cursor.rowcount > 0
+
+    def keys(self, prefix: str) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key FROM kv WHERE substr(key, 1, ?) = ? AND (expires IS NULL OR expires > ?)",
+                (len(prefix), prefix, time.time())
+            ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class RedisStore(CoordinationStore):
+    """Redis 协调存储类，使用最小的 RESP 协议客户端，供多台主机共享"""
+
+    def __init__(self, host: str = None, port: int = None, db: int = None, password: str = None):
+        """
+        初始化 Redis 存储
+
+        Args:
+            host (str): Redis 地址，默认使用 Config.FLEET_REDIS_HOST
+            port (int): Redis 端口，默认使用 Config.FLEET_REDIS_PORT
+            db (int): 数据库编号，默认使用 Config.FLEET_REDIS_DB
+            password (str): 密码，默认使用 Config.FLEET_REDIS_PASSWORD
+        """
+        self.host = host or Config.FLEET_REDIS_HOST
+        self.port = port or Config.FLEET_REDIS_PORT
+        self.db = Config.FLEET_REDIS_DB if db is None else db
+        self.password = password if password is not None else Config.FLEET_REDIS_PASSWORD
+        self.logger = logging.getLogger(__name__)
+        self.sock: Optional[socket.socket] = None
+        self.reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """建立连接并完成认证和选库"""
+        self.sock = socket.create_connection((self.host, self.port), timeout=Config.FLEET_REDIS_TIMEOUT)
+        self.reader = self.sock.makefile("rb")
+        if self.password:
+            self._send(["AUTH", self.password])
+        if self.db:
+            self._send(["SELECT", str(self.db)])
+
+    def _send(self, args: List[str]) -> Any:
+        """发送一条命令并读取回复"""
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode("utf-8")
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(payload))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        """解析一条 RESP 回复"""
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis 连接已关闭")
+        kind, body = line[:1], line[1:-2].decode("utf-8")
+        if kind == b"+":
+            return body
+        if kind == b"-":
+            raise RuntimeError(f"Redis 错误: {body}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            return self.reader.read(length + 2)[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"无法解析的 Redis 回复: {line!r}")
+
+    def command(self, *args) -> Any:
+        """
+        执行一条命令，连接断开时重连一次
+
+        Returns:
+            Any: 命令回复
+        """
+        args = [str(arg) for arg in args]
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    return self._send(args)
+                except (OSError, ConnectionError):
+                    self._close_socket()
+                    if attempt:
+                        raise
+
+    def set(self, key: str, value: str, ttl: float = None, nx: bool = False) -> bool:
+        args = ["SET", key, value]
+        if ttl is not None:
+            args += ["PX", max(1, int(ttl * 1000))]
+        if nx:
+            args.append("NX")
+        return self.command(*args) == "OK"
+
+    def get(self, key: str) -> Optional[str]:
+        return self.command("GET", key)
+
+    def delete(self, key: str, value: str = None) -> bool:
+        if value is None:
+            return self.command("DEL", key) > 0
+        return self.command("EVAL", COMPARE_AND_DELETE_SCRIPT, 1, key, value) > 0
+
+    def keys(self, prefix: str) -> List[str]:
+        # 协调数据使用独立的键前缀且数量很少，直接使用 KEYS
+        pattern = "".join("\\" + c if c in "*?[]\\" else c for c in prefix) + "*"
+        return sorted(self.command("KEYS", pattern) or [])
+
+    def _close_socket(self):
+        """关闭套接字"""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+    def close(self):
+        with self._lock:
+            self._close_socket()
+
+
+def create_store(kind: str = None) -> CoordinationStore:
+    """
+    按配置创建协调存储
+
+    Args:
+        kind (str): "sqlite" 或 "redis"，默认使用 Config.FLEET_STORE
+
+    Returns:
+        CoordinationStore: 协调存储
+    """
+    kind = kind or Config.FLEET_STORE
+    if kind == "redis":
+        return RedisStore()
+    if kind != "sqlite":
+        raise ValueError(f"未知的协调存储: {kind}")
+    return SQLiteStore()
+
+
+class FleetCoordinator:
+    """集群协调类，负责节点心跳、轮询时隙、观测共享和预订租约"""
+
+    def __init__(self, store: CoordinationStore = None, worker_id: str = None):
+        """
+        初始化集群协调
+
+        Args:
+            store (CoordinationStore): 协调存储，默认按配置创建
+            worker_id (str): 本节点标识，默认使用 Config.FLEET_WORKER_ID 或 "主机名:进程号"
+        """
+        self.store = store or create_store()
+        self.worker_id = worker_id or Config.FLEET_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+        self.prefix = Config.FLEET_KEY_PREFIX
+        self.logger = logging.getLogger(__name__)
+        self.stats = {"shared_reads": 0, "claims": 0, "claims_lost": 0, "store_errors": 0}
+
+    def _key(self, *parts: str) -> str:
+        """拼接带前缀的键"""
+        return self.prefix + ":".join(parts)
+
+    def _safe(self, operation, default=None):
+        """执行存储操作，存储不可用时记录错误并返回默认值（不影响单机抢占）"""
+        try:
+            return operation()
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            self.logger.warning(f"协调存储操作失败: {e}")
+            return default
+
+    def heartbeat(self) -> bool:
+        """
+        上报本节点存活
+
+        Returns:
+            bool: 是否上报成功
+        """
+        return bool(self._safe(lambda: self.store.set(
+            self._key("worker", self.worker_id), str(time.time()), Config.FLEET_HEARTBEAT_TTL
+        )))
+
+    def poll_slot(self) -> Tuple[int, int]:
+        """
+        按存活节点排序得到本节点的轮询时隙
+
+        Returns:
+            Tuple[int, int]: (本节点序号, 存活节点数)
+        """
+        prefix = self._key("worker", "")
+        workers = [key[len(prefix):] for key in self._safe(lambda: self.store.keys(prefix), [])]
+        if self.worker_id not in workers:
+            workers = sorted(workers + [self.worker_id])
+        return workers.index(self.worker_id), len(workers)
+
+    def next_poll_delay(self, interval: float) -> float:
+        """
+        计算距离本节点下一个轮询时隙的等待时间
+
+        每个周期按存活节点数均分，节点依次错开轮询，整个集群的轮询频率随节点数增加。
+
+        Args:
+            interval (float): 单个节点的轮询间隔（秒）
+
+        Returns:
+            float: 等待秒数，范围 (0, interval]
+        """
+        index, count = self.poll_slot()
+        offset = interval * index / count
+        delay = (offset - time.time()) % interval
+        return delay or interval
+
+    def observation_max_age(self) -> float:
+        """
+        其他节点的观测结果可直接使用的最长时间
+
+        必须明显短于相邻时隙的间隔（WAIT_BETWEEN_CHECKS / 存活节点数），否则轮到本节点时
+        上一个节点的结果仍然有效，本节点不再真正轮询，整个集群的轮询频率被限制为每个有效期一次。
+        未配置 FLEET_OBSERVATION_MAX_AGE 时取时隙间隔的 FLEET_OBSERVATION_SLOT_FRACTION，
+        只合并几乎同时发生的重复识别（如多个节点同时启动或被唤醒）。
+
+        Returns:
+            float: 有效期（秒）
+        """
+        if Config.FLEET_OBSERVATION_MAX_AGE is not None:
+            return Config.FLEET_OBSERVATION_MAX_AGE
+        _, count = self.poll_slot()
+        return Config.WAIT_BETWEEN_CHECKS / count * Config.FLEET_OBSERVATION_SLOT_FRACTION
+
+    def share_observation(self, lot: str, count: int, confidence: float = float("nan")):
+        """
+        共享一次车位观测结果
+
+        Args:
+            lot (str): 车场名称
+            count (int): 剩余车位数
+            confidence (float): 置信度
+        """
+        value = json.dumps({
+            "count": count,
+            "confidence": None if confidence != confidence else confidence,
+            "worker": self.worker_id,
+            "ts": time.time(),
+        })
+        self._safe(lambda: self.store.set(self._key("obs", lot), value, self.observation_max_age()))
+
+    def fresh_observations(self, lots: List[str]) -> Optional[Dict[str, int]]:
+        """
+        获取其他节点对全部车场的新鲜观测结果
+
+        Args:
+            lots (List[str]): 车场名称列表
+
+        Returns:
+            Optional[Dict[str, int]]: 车场名称 -> 剩余车位数，任一车场没有其他节点的新鲜观测时返回 None
+        """
+        counts = {}
+        now = time.time()
+        max_age = self.observation_max_age()
+        for lot in lots:
+            raw = self._safe(lambda: self.store.get(self._key("obs", lot)))
+            if raw is None:
+                return None
+            observation = json.loads(raw)
+            if observation["worker"] == self.worker_id or now - observation["ts"] > max_age:
+                return None
+            counts[lot] = observation["count"]
+
+        self.stats["shared_reads"] += 1
+        return counts
+
+    def claim(self, lot: str) -> bool:
+        """
+        获取车场的预订租约，同一时刻只有一个节点能预订同一车场
+
+        Args:
+            lot (str): 车场名称
+
+        Returns:
+            bool: 是否获得租约（存储不可用时视为获得，不阻止单机预订）
+        """
+        self.stats["claims"] += 1
+        claimed = self._safe(
+            lambda: self.store.set(self._key("lease", lot), self.worker_id, Config.FLEET_LEASE_TTL, nx=True), True
+        )
+        if not claimed:
+            self.stats["claims_lost"] += 1
+            holder = self._safe(lambda: self.store.get(self._key("lease", lot)))
+            self.logger.info(f"车场 {lot} 的预订租约已被 {holder} 持有，跳过预订")
+        return claimed
+
+    def release(self, lot: str):
+        """释放本节点持有的车场租约"""
+        self._safe(lambda: self.store.delete(self._key("lease", lot), self.worker_id))
+
+    def mark_booked(self, lot: str):
+        """记录集群已预订成功，其他节点随后停止抢占"""
+        value = json.dumps({"lot": lot, "worker": self.worker_id, "ts": time.time()})
+        self._safe(lambda: self.store.set(self._key("booked"), value, Config.FLEET_BOOKED_TTL))
+
+    def booked_by_other(self) -> Optional[Dict[str, Any]]:
+        """
+        查询是否已有其他节点预订成功
+
+        Returns:
+            Optional[Dict[str, Any]]: 预订记录，没有时返回 None
+        """
+        raw = self._safe(lambda: self.store.get(self._key("booked")))
+        if raw is None:
+            return None
+        booked = json.loads(raw)
+        return booked if booked["worker"] != self.worker_id else None
+
+    def leave(self):
+        """注销本节点，其他节点随即重新划分轮询时隙"""
+        self._safe(lambda: self.store.delete(self._key("worker", self.worker_id)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """协调统计及当前时隙"""
+        index, count = self.poll_slot()
+        return {**self.stats, "worker": self.worker_id, "slot": f"{index + 1}/{count}"}
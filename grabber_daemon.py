@@ -0,0 +1,310 @@
+"""
+常驻守护进程 - 保持 ADB 会话与 OCR 识别器常驻，并通过本地 HTTP 接口控制监控
+"""
+
+import json
+import logging
+import threading
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+from config import Config
+from parking_grabber import ParkingGrabber
+
+# 可通过 /target 接口切换的目标配置项: 请求字段 -> (Config 属性, 元素个数)
+TARGET_FIELDS = {
+    "parking_button": ("PARKING_BUTTON_COORDS", 2),
+    "book_button": ("BOOK_NOW_BUTTON_COORDS", 2),
+    "count_region": ("PARKING_COUNT_REGION", 4),
+}
+
+
+class GrabberDaemon:
+    """守护进程类，管理常驻的车位抢占器及其监控线程"""
+
+    def __init__(self, grabber: ParkingGrabber = None, host: str = None, port: int = None):
+        """
+        初始化守护进程
+
+        Args:
+            grabber (ParkingGrabber): 车位抢占器，默认新建
+            host (str): 控制接口监听地址，默认使用 Config.DAEMON_HOST
+            port (int): 控制接口端口，默认使用 Config.DAEMON_PORT
+        """
+        self.grabber = grabber or ParkingGrabber()
+        self.host = host or Config.DAEMON_HOST
+        self.port = port or Config.DAEMON_PORT
+        self.logger = logging.getLogger(__name__)
+        self.monitor_thread: Optional[threading.Thread] = None
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.last_result: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """当前监控状态: idle / running / paused"""
+        if self.monitor_thread is None or not self.monitor_thread.is_alive():
+            return "idle"
+        return "paused" if self.grabber.is_paused else "running"
+
+    def start_monitoring(self) -> Tuple[bool, str]:
+        """
+        在后台线程中开始监控
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 说明)
+        """
+        with self._lock:
+            if self.state != "idle":
+                return False, "监控已在运行"
+
+            self.grabber.is_paused = False
+            self.monitor_thread = threading.Thread(target=self._run_monitor, name="GrabberMonitor", daemon=True)
+            self.monitor_thread.start()
+            return True, "监控已启动"
+
+    def _run_monitor(self):
+        """监控线程主体，结束后记录结果"""
+        ok = self.grabber.start()
+        if not ok:
+            self.last_result = "failed"
+        elif self.grabber.booked:
+            self.last_result = "booked"
+        else:
+            self.last_result = "stopped"
+        self.logger.info(f"监控已结束: {self.last_result}")
+
+    def stop_monitoring(self, timeout: float = None) -> Tuple[bool, str]:
+        """
+        停止监控并等待当前周期结束
+
+        Args:
+            timeout (float): 等待监控线程退出的最长时间（秒）
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 说明)
+        """
+        if self.state == "idle":
+            return False, "监控未运行"
+
+        self.grabber.stop()
+        self.monitor_thread.join(timeout if timeout is not None else Config.CYCLE_DEADLINE)
+        if self.monitor_thread.is_alive():
+            return True, "已发出停止信号，当前周期结束后停止"
+        return True, "监控已停止"
+
+    def pause(self) -> Tuple[bool, str]:
+        """暂停监控"""
+        if self.state != "running":
+            return False, "监控未在运行"
+        self.grabber.pause()
+        return True, "监控已暂停"
+
+    def resume(self) -> Tuple[bool, str]:
+        """恢复监控"""
+        if self.state != "paused":
+            return False, "监控未暂停"
+        self.grabber.resume()
+        return True, "监控已恢复"
+
+    def set_target(self, payload: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        切换监控目标，下一个检查周期生效
+
+        Args:
+            payload (Dict[str, Any]): 可包含 device、parking_button、book_button、count_region，
+                以及 lots（启用的车场名称列表，null 表示全部启用）
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 说明)
+        """
+        updates = {}
+        for field, (attr, size) in TARGET_FIELDS.items():
+            if field not in payload:
+                continue
+            value = payload[field]
+            if not isinstance(value, (list, tuple)) or len(value) != size or \
+                    not all(isinstance(v, int) for v in value):
+                return False, f"{field} 需要 {size} 个整数"
+            updates[attr] = tuple(value)
+
+        device = payload.get("device")
+        if device is not None and not isinstance(device, str):
+            return False, "device 需要为字符串，如 127.0.0.1:5557"
+        if not updates and device is None and "lots" not in payload:
+            return False, "未提供任何目标字段"
+
+        if "lots" in payload and not self.grabber.lots.set_active(payload["lots"]):
+            return False, f"未知车场: {payload['lots']}"
+
+        for attr, value in updates.items():
+            setattr(Config, attr, value)
+
+        if device is not None and device != self.grabber.adb.device_id:
+            self.grabber.adb.device_id = device
+            if not self.grabber.adb.connect_device():
+                self.logger.warning(f"切换后连接设备失败: {device}")
+
+        self.grabber.wake()
+        self.logger.info(f"监控目标已切换: {payload}")
+        return True, "目标已切换"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取实时统计
+
+        Returns:
+            Dict[str, Any]: 状态、运行统计、ADB 调用计数、数据源 / 集群协调统计及当前目标
+        """
+        return {
+            "state": self.state,
+            "last_result": self.last_result,
+            "stats": self.grabber.stats.get_summary(),
+            "adb": self.grabber.adb.get_stats(),
+            "source": self.grabber.source.get_stats(),
+            "fleet": self.grabber.fleet.get_stats() if self.grabber.fleet is not None else None,
+            "target": {
+                "device": self.grabber.adb.device_id,
+                **{field: getattr(Config, attr) for field, (attr, _) in TARGET_FIELDS.items()},
+                "lots": [lot.name for lot in self.grabber.lots.lots],
+            },
+        }
+
+    def handle_command(self, command: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        处理一条控制命令
+
+        Args:
+            command (str): 命令名称
+            payload (Dict[str, Any]): 命令参数
+
+        Returns:
+            Tuple[int, Dict[str, Any]]: (HTTP 状态码, 响应内容)
+        """
+        if command == "stats":
+            return 200, self.get_stats()
+
+        actions = {
+            "start": self.start_monitoring,
+            "stop": self.stop_monitoring,
+            "pause": self.pause,
+            "resume": self.resume,
+            "target": lambda: self.set_target(payload),
+            "shutdown": self.shutdown,
+        }
+        if command not in actions:
+            return 404, {"ok": False, "message": f"未知命令: {command}"}
+
+        ok, message = actions[command]()
+        return (200 if ok else 409), {"ok": ok, "message": message, "state": self.state}
+
+    def serve_forever(self, prewarm: bool = True, autostart: bool = False):
+        """
+        启动控制接口并阻塞运行
+
+        Args:
+            prewarm (bool): 是否预先连接设备并加载 OCR 模型
+            autostart (bool): 是否立即开始监控
+        """
+        if prewarm:
+            self.grabber.prewarm()
+
+        self.server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self.logger.info(f"守护进程控制接口已启动: http://{self.host}:{self.port}")
+
+        if autostart:
+            self.start_monitoring()
+
+        try:
+            self.server.serve_forever()
+        finally:
+            self.grabber.stop()
+            self.server.server_close()
+            self.logger.info("守护进程已退出")
+
+    def shutdown(self) -> Tuple[bool, str]:
+        """停止监控并关闭控制接口"""
+        self.grabber.stop()
+        if self.server is not None:
+            # serve_forever 所在线程之外调用 shutdown，避免在请求线程中死锁
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return True, "守护进程正在退出"
+
+
+def _make_handler(daemon: GrabberDaemon):
+    """创建绑定到指定守护进程的请求处理类"""
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        """控制接口请求处理类: GET /stats，POST /start|stop|pause|resume|target|shutdown"""
+
+        def _reply(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.strip("/") != "stats":
+                self._reply(404, {"ok": False, "message": "GET 仅支持 /stats"})
+                return
+            self._reply(*daemon.handle_command("stats", {}))
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                self._reply(400, {"ok": False, "message": "Content-Length 无效"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {"ok": False, "message": "请求体不是合法 JSON"})
+                return
+            if not isinstance(payload, dict):
+                self._reply(400, {"ok": False, "message": "请求体需要为 JSON 对象"})
+                return
+            self._reply(*daemon.handle_command(self.path.strip("/"), payload))
+
+        def log_message(self, format, *args):
+            daemon.logger.debug(f"控制请求: {format % args}")
+
+    return ControlHandler
+
+
+def send_command(command: str, payload: Dict[str, Any] = None, host: str = None,
+                 port: int = None, timeout: float = None) -> Optional[Dict[str, Any]]:
+    """
+    向本地守护进程发送控制命令
+
+    Args:
+        command (str): 命令名称（stats / start / stop / pause / resume / target / shutdown）
+        payload (Dict[str, Any]): 命令参数
+        host (str): 守护进程地址
+        port (int): 守护进程端口
+        timeout (float): 请求超时（秒），默认比 stop 等待监控线程的时间更长
+
+    Returns:
+        Optional[Dict[str, Any]]: 响应内容，无法连接时返回 None
+    """
+    if timeout is None:
+        timeout = Config.CYCLE_DEADLINE + 10
+    url = f"http://{host or Config.DAEMON_HOST}:{port or Config.DAEMON_PORT}/{command}"
+    if command == "stats":
+        request = urllib.request.Request(url)
+    else:
+        data = json.dumps(payload or {}).encode("utf-8")
+        request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}")
+    except Exception as e:
+        logging.getLogger(__name__).error(f"无法连接守护进程: {e}")
+        return None
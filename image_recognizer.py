@@ -3,12 +3,73 @@
 """
 
 import cv2
+import bisect
 import numpy as np
 import pytesseract
 import logging
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from PIL import Image
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, Any, List, Set
 from config import Config
+from utils import Utils
+
+# 可调优的预处理 / OCR 参数名称及其在 Config 中的默认值来源
+TUNABLE_PARAMS = {
+    "blur_kernel": "OCR_BLUR_KERNEL",
+    "block_size": "OCR_THRESH_BLOCK_SIZE",
+    "c": "OCR_THRESH_C",
+    "scale": "OCR_SCALE_FACTOR",
+    "psm": "OCR_PSM",
+}
+
+class TesseractGroup:
+    """Tesseract 进程组类，记录一次竞速中启动的进程，竞速结束时终止仍在运行的进程"""
+    
+    def __init__(self):
+        """初始化进程组"""
+        self.processes: Set[subprocess.Popen] = set()
+        self.closed = False
+        self._lock = threading.Lock()
+    
+    def add(self, process: subprocess.Popen) -> bool:
+        """
+        登记进程，进程组已关闭时立即终止该进程
+        
+        Returns:
+            bool: 是否登记成功
+        """
+        with self._lock:
+            if not self.closed:
+                self.processes.add(process)
+                return True
+        process.kill()
+        return False
+    
+    def discard(self, process: subprocess.Popen):
+        """进程结束后取消登记"""
+        with self._lock:
+            self.processes.discard(process)
+    
+    def kill_all(self) -> int:
+        """
+        关闭进程组并终止其中仍在运行的进程
+        
+        Returns:
+            int: 终止的进程数
+        """
+        with self._lock:
+            self.closed = True
+            processes, self.processes = self.processes, set()
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        return len(processes)
+
 
 class ImageRecognizer:
     """图像识别器类，负责处理截图和识别文字"""
@@ -16,10 +77,49 @@ class ImageRecognizer:
     def __init__(self):
         """初始化图像识别器"""
         self.logger = logging.getLogger(__name__)
+        self.params = self.load_params()
+        # 最近一次 extract_lot_counts 中各车场的识别置信度（0~1，未知为 NaN）
+        self.last_confidences: Dict[str, float] = {}
+        # 多方案竞速识别的线程池（首次竞速时创建）及统计
+        self._race_pool: Optional[ThreadPoolExecutor] = None
+        self.race_stats = {"races": 0, "early_wins": 0, "votes": 0, "failures": 0, "killed": 0}
+        self._race_stats_lock = threading.Lock()
         
         # 配置 Tesseract OCR（如果需要指定路径）
         # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
     
+    @staticmethod
+    def default_params() -> Dict[str, Any]:
+        """
+        获取 Config 中的默认预处理 / OCR 参数
+        
+        Returns:
+            Dict[str, Any]: 参数字典
+        """
+        return {name: getattr(Config, attr) for name, attr in TUNABLE_PARAMS.items()}
+    
+    def load_params(self, profile_path: str = None) -> Dict[str, Any]:
+        """
+        加载预处理 / OCR 参数，调优文件中的值覆盖 Config 默认值
+        
+        Args:
+            profile_path (str): 调优参数文件路径，默认使用配置中的路径
+            
+        Returns:
+            Dict[str, Any]: 参数字典
+        """
+        if profile_path is None:
+            profile_path = Config.OCR_PROFILE_PATH
+        
+        params = self.default_params()
+        profile = Utils.load_config(profile_path)
+        if profile:
+            tuned = profile.get("params", {})
+            params.update({k: v for k, v in tuned.items() if k in TUNABLE_PARAMS})
+            self.logger.info(f"已加载 OCR 调优参数: {profile_path} {params}")
+        
+        return params
+    
     def extract_parking_count(self, image_path: str) -> Optional[int]:
         """
         从截图中提取剩余车位数量
@@ -41,11 +141,8 @@ class ImageRecognizer:
             x1, y1, x2, y2 = Config.PARKING_COUNT_REGION
             roi = image[y1:y2, x1:x2]
             
-            # 图像预处理
-            processed_roi = self._preprocess_image(roi)
-            
-            # OCR 识别
-            parking_count = self._ocr_extract_number(processed_roi)
+            # 图像预处理 + OCR 识别（按配置在识别失败时竞速多方案）
+            parking_count, _ = self._recognize_single(roi)
             
             if parking_count is not None:
                 self.logger.info(f"识别到剩余车位数量: {parking_count}")
@@ -58,25 +155,143 @@ class ImageRecognizer:
             self.logger.error(f"提取车位数量时发生错误: {e}")
             return None
     
-    def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
+    def extract_lot_counts(self, image_path: str, lots: List[Any]) -> Dict[str, Optional[int]]:
+        """
+        从一张截图中一次性提取多个车场的剩余车位数量
+        
+        Args:
+            image_path (str): 截图文件路径
+            lots (List[ParkingLot]): 车场列表
+            
+        Returns:
+            Dict[str, Optional[int]]: 车场名称 -> 剩余车位数量，识别失败的车场为 None
+        """
+        counts = {lot.name: None for lot in lots}
+        
+        try:
+            # 整个周期只读取一次截图
+            image = cv2.imread(image_path)
+            if image is None:
+                self.logger.error(f"无法读取图像文件: {image_path}")
+                return counts
+            
+            rois = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in (lot.region for lot in lots)]
+            
+            if len(rois) == 1:
+                results = [self._recognize_single(rois[0])]
+            else:
+                results = self._recognize_batch(rois)
+            
+            counts = {lot.name: value for lot, (value, _) in zip(lots, results)}
+            self.last_confidences = {lot.name: confidence for lot, (_, confidence) in zip(lots, results)}
+            self.logger.info(f"识别到各车场剩余车位: {counts}")
+            return counts
+            
+        except Exception as e:
+            self.logger.error(f"提取多车场车位数量时发生错误: {e}")
+            return counts
+    
+    def _recognize_batch(self, rois: List[np.ndarray],
+                         params: Dict[str, Any] = None) -> List[Tuple[Optional[int], float]]:
+        """
+        将多个 ROI 纵向拼接成一张图，一次预处理、一次 OCR 识别全部区域
+        
+        每个 ROI 上下用背景色填充隔开，右侧补齐到相同宽度；
+        OCR 结果按文字中心所在的纵向区间归属到对应 ROI，未识别出的 ROI 再单独识别；
+        置信度低于 OCR_CONFIDENCE_THRESHOLD 的结果直接竞速多方案，竞速失败时保留拼接识别的结果。
+        
+        Args:
+            rois (List[np.ndarray]): ROI 图像列表
+            params (Dict[str, Any]): 预处理 / OCR 参数，默认使用当前加载的参数
+            
+        Returns:
+            List[Tuple[Optional[int], float]]: 与 rois 顺序一致的 (识别结果, 置信度)，
+                单独识别的 ROI 置信度为 NaN
+        """
+        if params is None:
+            params = self.params
+        
+        padding = Config.OCR_BATCH_PADDING
+        width = max(roi.shape[1] for roi in rois)
+        bands = []
+        band_starts = []
+        top = 0
+        
+        for roi in rois:
+            # 以 ROI 四周像素的中位数作为背景色填充；复制边缘像素会把最右一列拉成横条，被识别成多余的数字或 1
+            edges = np.concatenate([roi[0], roi[-1], roi[:, 0], roi[:, -1]])
+            background = [int(v) for v in np.median(edges, axis=0)]
+            band = cv2.copyMakeBorder(
+                roi, padding, padding, 0, width - roi.shape[1], cv2.BORDER_CONSTANT, value=background
+            )
+            bands.append(band)
+            band_starts.append(top)
+            top += band.shape[0]
+        
+        canvas = self._preprocess_image(np.vstack(bands), params)
+        scale = params["scale"]
+        band_starts = [start * scale for start in band_starts]
+        
+        # --psm 6: 将整张图视为统一的文本块，逐行识别。拼接图包含多行数字，调优结果中的 --psm 只针对单个 ROI
+        # （7 单行 / 8 单词 / 13 原始行，都只会读出一行），因此拼接识别固定使用 6，其余预处理参数仍取自调优结果；
+        # 数字白名单与单独识别一致
+        custom_config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789'
+        data = pytesseract.image_to_data(canvas, config=custom_config, output_type=pytesseract.Output.DICT)
+        
+        words: List[List[Tuple[int, str, float]]] = [[] for _ in rois]
+        for text, left, word_top, height, conf in zip(
+                data["text"], data["left"], data["top"], data["height"], data["conf"]):
+            digits = ''.join(filter(str.isdigit, text))
+            if not digits:
+                continue
+            index = bisect.bisect_right(band_starts, word_top + height / 2) - 1
+            if 0 <= index < len(rois):
+                words[index].append((left, digits, float(conf) / 100))
+        
+        results = []
+        for roi, band_words in zip(rois, words):
+            if band_words:
+                band_words.sort()
+                value = int(''.join(digits for _, digits, _ in band_words))
+                confidence = min(conf for _, _, conf in band_words)
+                if confidence < Config.OCR_CONFIDENCE_THRESHOLD and Config.OCR_RACE_MODE != "off":
+                    raced = self.race_roi(roi)
+                    results.append(raced if raced[0] is not None else (value, confidence))
+                else:
+                    results.append((value, confidence))
+                continue
+            results.append(self._recognize_single(roi))
+        
+        return results
+    
+    def _preprocess_image(self, image: np.ndarray, params: Dict[str, Any] = None) -> np.ndarray:
         """
         图像预处理，提高OCR识别准确率
         
         Args:
             image (np.ndarray): 原始图像
+            params (Dict[str, Any]): 预处理参数，默认使用当前加载的参数
             
         Returns:
             np.ndarray: 处理后的图像
         """
+        if params is None:
+            params = self.params
+        
         # 转换为灰度图
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # 高斯模糊去噪
-        blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+        blur_kernel = int(params["blur_kernel"])
+        if blur_kernel > 1:
+            blurred = cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
+        else:
+            blurred = gray
         
         # 自适应阈值二值化
         binary = cv2.adaptiveThreshold(
-            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+            int(params["block_size"]), params["c"]
         )
         
         # 形态学操作，去除噪点
@@ -84,23 +299,30 @@ class ImageRecognizer:
         cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
         
         # 放大图像以提高识别精度
-        resized = cv2.resize(cleaned, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+        scale = params["scale"]
+        if scale == 1:
+            return cleaned
+        resized = cv2.resize(cleaned, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
         
         return resized
     
-    def _ocr_extract_number(self, image: np.ndarray) -> Optional[int]:
+    def _ocr_extract_number(self, image: np.ndarray, params: Dict[str, Any] = None) -> Optional[int]:
         """
         使用OCR从图像中提取数字
         
         Args:
             image (np.ndarray): 预处理后的图像
+            params (Dict[str, Any]): OCR 参数，默认使用当前加载的参数
             
         Returns:
             Optional[int]: 提取到的数字，失败时返回 None
         """
+        if params is None:
+            params = self.params
+        
         try:
             # 配置OCR参数，只识别数字
-            custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=0123456789'
+            custom_config = f'--oem 3 --psm {int(params["psm"])} -c tessedit_char_whitelist=0123456789'
             
             # 执行OCR识别
             text = pytesseract.image_to_string(image, config=custom_config)
@@ -118,13 +340,232 @@ class ImageRecognizer:
             self.logger.error(f"OCR识别时发生错误: {e}")
             return None
     
-    def save_debug_image(self, image_path: str, output_path: str = "debug_roi.png") -> bool:
+    @staticmethod
+    def _tesseract_data(image: np.ndarray, config: str, timeout: float,
+                        group: TesseractGroup) -> Dict[str, List[str]]:
+        """
+        直接启动 Tesseract 进程识别并解析 TSV 输出（与 image_to_data 的 DICT 输出字段一致）
+        
+        进程登记到进程组，竞速结束时可被立即终止，不会继续占用线程池的工作线程。
+        
+        Args:
+            image (np.ndarray): 预处理后的图像
+            config (str): Tesseract 参数
+            timeout (float): 进程超时（秒），0 表示不限
+            group (TesseractGroup): 所属进程组
+            
+        Returns:
+            Dict[str, List[str]]: 列名 -> 各行取值，进程被终止或失败时各列为空
+        """
+        ok, png = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("图像编码失败")
+        
+        command = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout"] + config.split() + ["tsv"]
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+        if not group.add(process):
+            process.wait()
+            return {"text": [], "left": [], "conf": []}
+        try:
+            output, _ = process.communicate(png.tobytes(), timeout=timeout or None)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            group.discard(process)
+        
+        lines = output.decode("utf-8", errors="replace").splitlines()
+        if process.returncode != 0 or not lines:
+            return {"text": [], "left": [], "conf": []}
+        header = lines[0].split("\t")
+        rows = [line.split("\t") for line in lines[1:]]
+        return {
+            name: [row[index] if index < len(row) else "" for row in rows]
+            for index, name in enumerate(header)
+        }
+    
+    def _ocr_with_confidence(self, image: np.ndarray, params: Dict[str, Any],
+                             timeout: float = 0, group: TesseractGroup = None) -> Tuple[Optional[int], float]:
+        """
+        使用OCR提取数字并给出置信度
+        
+        Args:
+            image (np.ndarray): 预处理后的图像
+            params (Dict[str, Any]): OCR 参数
+            timeout (float): Tesseract 进程超时（秒），0 表示不限，超时后进程会被终止
+            group (TesseractGroup): 进程组，指定时 Tesseract 进程可被随时终止（竞速识别使用）
+            
+        Returns:
+            Tuple[Optional[int], float]: (识别到的数字, 置信度 0~1)，失败时数字为 None
+        """
+        custom_config = f'--oem 3 --psm {int(params["psm"])} -c tessedit_char_whitelist=0123456789'
+        if group is not None:
+            data = self._tesseract_data(image, custom_config, timeout, group)
+        else:
+            data = pytesseract.image_to_data(
+                image, config=custom_config, output_type=pytesseract.Output.DICT, timeout=timeout
+            )
+        
+        words = [
+            (left, ''.join(filter(str.isdigit, text)), float(conf) / 100)
+            for text, left, conf in zip(data["text"], data["left"], data["conf"])
+        ]
+        words = sorted(word for word in words if word[1])
+        if not words:
+            return None, 0.0
+        
+        return int(''.join(digits for _, digits, _ in words)), min(conf for _, _, conf in words)
+    
+    def recognize_count(self, roi: np.ndarray) -> Tuple[Optional[int], float]:
+        """
+        识别已裁剪 ROI 中的车位数并给出置信度（识别失败时按 OCR_RACE_MODE 竞速）
+        
+        Args:
+            roi (np.ndarray): 车位数量区域图像（BGR）
+            
+        Returns:
+            Tuple[Optional[int], float]: (识别结果, 置信度)
+        """
+        return self._recognize_single(roi)
+    
+    def _recognize_single(self, roi: np.ndarray) -> Tuple[Optional[int], float]:
+        """
+        按 OCR_RACE_MODE 识别单个 ROI
+        
+        "off" 只做一次识别；"fallback" 一次识别失败后再竞速多方案；"always" 直接竞速。
+        
+        Args:
+            roi (np.ndarray): 车位数量区域图像
+            
+        Returns:
+            Tuple[Optional[int], float]: (识别结果, 置信度)，未经竞速的结果置信度为 NaN
+        """
+        if Config.OCR_RACE_MODE == "always":
+            return self.race_roi(roi)
+        
+        value = self.recognize_roi(roi)
+        if value is None and Config.OCR_RACE_MODE == "fallback":
+            return self.race_roi(roi)
+        return value, float("nan")
+    
+    def _count_race(self, key: str, amount: int = 1):
+        """累加竞速统计（可能在多个线程中同时竞速）"""
+        with self._race_stats_lock:
+            self.race_stats[key] += amount
+    
+    def race_roi(self, roi: np.ndarray) -> Tuple[Optional[int], float]:
+        """
+        在同一 ROI 上并发运行多种预处理 / --psm 方案
+        
+        任一方案置信度达到 OCR_CONFIDENCE_THRESHOLD 即返回并取消其余方案；
+        否则在所有完成的方案中投票，至少两个方案一致时采用多数结果。
+        Tesseract 在独立进程中运行，线程池即可并行；竞速结束时未开始的方案被取消，
+        已开始的方案的 Tesseract 进程被立即终止，不会拖慢之后其他车场的竞速。
+        
+        Args:
+            roi (np.ndarray): 车位数量区域图像
+            
+        Returns:
+            Tuple[Optional[int], float]: (识别结果, 置信度)，识别失败时结果为 None
+        """
+        if self._race_pool is None:
+            self._race_pool = ThreadPoolExecutor(Config.OCR_RACE_WORKERS, thread_name_prefix="OCRRace")
+        
+        self._count_race("races")
+        cancelled = threading.Event()
+        group = TesseractGroup()
+        variants = [{**self.params, **variant} for variant in Config.OCR_RACE_VARIANTS]
+        
+        def run_variant(params: Dict[str, Any]) -> Tuple[Optional[int], float]:
+            if cancelled.is_set():
+                return None, 0.0
+            processed = self._preprocess_image(roi, params)
+            if cancelled.is_set():
+                return None, 0.0
+            return self._ocr_with_confidence(processed, params, Config.OCR_RACE_TIMEOUT, group)
+        
+        futures = {self._race_pool.submit(run_variant, params): params for params in variants}
+        results = []
+        
+        try:
+            for future in as_completed(futures, timeout=Config.OCR_RACE_TIMEOUT):
+                try:
+                    value, confidence = future.result()
+                except Exception as e:
+                    self.logger.debug(f"竞速方案失败 {futures[future]}: {e}")
+                    continue
+                
+                if value is None:
+                    continue
+                if confidence >= Config.OCR_CONFIDENCE_THRESHOLD:
+                    self._count_race("early_wins")
+                    self.logger.debug(f"竞速识别命中: {value}（置信度 {confidence:.2f}，方案 {futures[future]}）")
+                    return value, confidence
+                results.append((value, confidence))
+        except FuturesTimeout:
+            self.logger.debug("竞速识别超时，按已完成的方案投票")
+        finally:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+            killed = group.kill_all()
+            if killed:
+                self._count_race("killed", killed)
+        
+        votes = Counter(value for value, _ in results)
+        if votes:
+            (value, count), *rest = votes.most_common()
+            if count >= 2 and (not rest or rest[0][1] < count):
+                self._count_race("votes")
+                confidence = sum(c for v, c in results if v == value) / count
+                self.logger.debug(f"竞速识别投票: {value}（{count}/{len(variants)} 个方案一致）")
+                return value, confidence
+        
+        self._count_race("failures")
+        return None, 0.0
+    
+    def recognize_roi(self, roi: np.ndarray, params: Dict[str, Any] = None) -> Optional[int]:
+        """
+        对已裁剪的 ROI 区域执行预处理和数字识别
+        
+        Args:
+            roi (np.ndarray): 车位数量区域图像
+            params (Dict[str, Any]): 预处理 / OCR 参数，默认使用当前加载的参数
+            
+        Returns:
+            Optional[int]: 识别到的数字，失败时返回 None
+        """
+        processed = self._preprocess_image(roi, params)
+        return self._ocr_extract_number(processed, params)
+    
+    def warm_up(self) -> bool:
+        """
+        预热识别链路：对空白图像执行一次完整识别，提前加载 Tesseract 模型
+        
+        Returns:
+            bool: 预热是否成功
+        """
+        try:
+            x1, y1, x2, y2 = Config.PARKING_COUNT_REGION
+            blank = np.full((max(y2 - y1, 1), max(x2 - x1, 1), 3), 255, dtype=np.uint8)
+            self.recognize_roi(blank)
+            pytesseract.get_tesseract_version()
+            return True
+        except Exception as e:
+            self.logger.error(f"OCR 预热失败: {e}")
+            return False
+    
+    def save_debug_image(self, image_path: str, output_path: str = "debug_roi.png",
+                         region: Tuple[int, int, int, int] = None) -> bool:
         """
         保存调试用的ROI区域图像
         
         Args:
             image_path (str): 原始截图路径
             output_path (str): 输出路径
+            region (Tuple[int, int, int, int]): ROI 区域，默认使用 Config.PARKING_COUNT_REGION
             
         Returns:
             bool: 保存是否成功
@@ -135,7 +576,7 @@ class ImageRecognizer:
                 return False
             
             # 裁剪ROI区域
-            x1, y1, x2, y2 = Config.PARKING_COUNT_REGION
+            x1, y1, x2, y2 = region or Config.PARKING_COUNT_REGION
             roi = image[y1:y2, x1:x2]
             
             # 预处理
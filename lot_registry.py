@@ -0,0 +1,141 @@
+"""
+车场注册表 - 管理多个车场 / 时段的识别区域、预订坐标和优先级规则
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple, Iterable
+from config import Config
+
+# 未配置 PARKING_LOTS 时使用的单一车场名称
+DEFAULT_LOT_NAME = "default"
+
+
+class ParkingLot:
+    """车场类，描述一个车场或时段在页面上的位置及预订规则"""
+
+    def __init__(self, name: str, region: Tuple[int, int, int, int],
+                 book_coords: Tuple[int, int], priority: int = 0, min_count: int = 1,
+                 api_id: str = None):
+        """
+        初始化车场
+
+        Args:
+            name (str): 车场名称
+            region (Tuple[int, int, int, int]): 剩余车位数字区域 (x1, y1, x2, y2)
+            book_coords (Tuple[int, int]): 预订按钮坐标
+            priority (int): 优先级，越小越优先
+            min_count (int): 剩余车位至少达到多少才预订
+            api_id (str): HTTP 数据源中的车场标识，默认与名称相同
+        """
+        self.name = name
+        self.region = tuple(region)
+        self.book_coords = tuple(book_coords)
+        self.priority = priority
+        self.min_count = min_count
+        self.api_id = api_id or name
+
+    def __repr__(self) -> str:
+        return f"ParkingLot({self.name!r}, region={self.region}, priority={self.priority})"
+
+
+class LotRegistry:
+    """车场注册表类，按配置加载车场并根据识别结果选出最优车场"""
+
+    def __init__(self):
+        """初始化车场注册表"""
+        self.logger = logging.getLogger(__name__)
+        # 当前启用的车场名称，None 表示全部启用
+        self.active_names: Optional[List[str]] = None
+
+    @staticmethod
+    def configured_lots() -> List[ParkingLot]:
+        """
+        读取配置中的全部车场
+
+        未配置 PARKING_LOTS 时，使用 PARKING_COUNT_REGION 和 BOOK_NOW_BUTTON_COORDS 构造单一车场，
+        每次调用重新读取，保证运行中修改 Config 立即生效。
+
+        Returns:
+            List[ParkingLot]: 车场列表
+        """
+        if not Config.PARKING_LOTS:
+            return [ParkingLot(DEFAULT_LOT_NAME, Config.PARKING_COUNT_REGION, Config.BOOK_NOW_BUTTON_COORDS)]
+
+        return [
+            ParkingLot(
+                lot["name"],
+                lot["region"],
+                lot.get("book_coords", Config.BOOK_NOW_BUTTON_COORDS),
+                lot.get("priority", 0),
+                lot.get("min_count", 1),
+                lot.get("api_id"),
+            )
+            for lot in Config.PARKING_LOTS
+        ]
+
+    @property
+    def lots(self) -> List[ParkingLot]:
+        """当前启用的车场列表"""
+        lots = self.configured_lots()
+        if self.active_names is None:
+            return lots
+        return [lot for lot in lots if lot.name in self.active_names]
+
+    def set_active(self, names: Optional[Iterable[str]]) -> bool:
+        """
+        设置启用的车场
+
+        Args:
+            names (Optional[Iterable[str]]): 车场名称列表，None 表示全部启用
+
+        Returns:
+            bool: 名称是否都存在
+        """
+        if names is None:
+            self.active_names = None
+            return True
+
+        names = list(names)
+        known = {lot.name for lot in self.configured_lots()}
+        unknown = [name for name in names if name not in known]
+        if unknown or not names:
+            self.logger.error(f"未知车场: {unknown or names}")
+            return False
+
+        self.active_names = names
+        return True
+
+    def get(self, name: str) -> Optional[ParkingLot]:
+        """
+        按名称获取车场
+
+        Args:
+            name (str): 车场名称
+
+        Returns:
+            Optional[ParkingLot]: 车场，不存在时返回 None
+        """
+        for lot in self.configured_lots():
+            if lot.name == name:
+                return lot
+        return None
+
+    def select_best(self, counts: Dict[str, Optional[int]]) -> Optional[ParkingLot]:
+        """
+        按优先级规则选出本周期应预订的车场
+
+        满足 min_count 的车场中优先级最高者胜出，优先级相同时选剩余车位多的。
+
+        Args:
+            counts (Dict[str, Optional[int]]): 车场名称 -> 识别到的剩余车位数
+
+        Returns:
+            Optional[ParkingLot]: 应预订的车场，没有满足条件的车场时返回 None
+        """
+        candidates = [
+            lot for lot in self.lots
+            if counts.get(lot.name) is not None and counts[lot.name] >= lot.min_count
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda lot: (lot.priority, -counts[lot.name]))
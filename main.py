@@ -4,39 +4,103 @@
 
 import logging
 import argparse
+import atexit
 import sys
 from parking_grabber import ParkingGrabber
+from async_logging import AsyncLogging
 from config import Config
 
-def setup_logging():
-    """配置日志系统"""
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL),
-        format=Config.LOG_FORMAT,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('parking_grabber.log', encoding='utf-8')
-        ]
-    )
+def setup_logging(sampling: bool = False) -> AsyncLogging:
+    """
+    配置日志系统：业务线程只把日志放入队列，控制台和文件输出由后台线程完成
+    
+    Args:
+        sampling (bool): 是否启用分阶段采样
+        
+    Returns:
+        AsyncLogging: 异步日志实例，程序退出时自动刷新并停止
+    """
+    async_logging = AsyncLogging(sampling or None)
+    async_logging.start()
+    atexit.register(async_logging.stop)
+    return async_logging
 
 def main():
     """主函数"""
     # 设置命令行参数
     parser = argparse.ArgumentParser(description='车位抢占自动化工具')
-    parser.add_argument('--mode', choices=['run', 'calibrate', 'test-ocr'], 
+    parser.add_argument('--mode', choices=['run', 'calibrate', 'test-ocr', 'tune', 'bench-startup',
+                                           'daemon', 'ctl', 'strike', 'timeline', 'profile',
+                                           'mock-api', 'bench-http', 'discover', 'mini-redis'], 
                        default='run', help='运行模式')
     parser.add_argument('--config', help='配置文件路径（可选）')
+    parser.add_argument('--samples', help='tune 模式：已标注 ROI 截图目录')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid',
+                       help='tune 模式：参数搜索方式')
+    parser.add_argument('--trials', type=int, default=50, help='tune 模式：随机搜索候选数量')
+    parser.add_argument('--prewarm', action='store_true',
+                       help='首次轮询前预先连接设备并加载 OCR 模型')
+    parser.add_argument('--startup-probe', action='store_true',
+                       help='输出到达首次轮询和首个读数的启动耗时，拿到首个读数后退出（供 bench-startup 使用）')
+    parser.add_argument('--repeats', type=int, default=3, help='bench-startup 模式：每个模式的测量次数')
+    parser.add_argument('--at', help='strike 模式：释放时刻，如 10:00、"2026-10-20 10:00:00" 或 Unix 时间戳')
+    parser.add_argument('--fire', choices=['refresh', 'blind'], default='refresh',
+                       help='strike 模式：到点刷新识别后预订，或直接点击预订按钮')
+    parser.add_argument('--since', help='timeline 模式：起始时间，如 "2026-10-01" 或 "2026-10-01 08:00:00"')
+    parser.add_argument('--until', help='timeline 模式：结束时间（不含）')
+    parser.add_argument('--lot', help='timeline 模式：只统计指定车场')
+    parser.add_argument('--device', help='timeline 模式：只统计指定设备')
+    parser.add_argument('--per-device', action='store_true',
+                       help='timeline 模式：按设备分别统计释放窗口（默认合并各设备的观测，每次释放只计一次）')
+    parser.add_argument('--cycles', type=int, default=10,
+                       help='profile 模式：分析的周期数；bench-http 模式：每种方式的轮询次数')
+    parser.add_argument('--replay', help='profile 模式：录制截图目录（不指定则使用真实设备）')
+    parser.add_argument('--output', help='profile 模式：输出文件前缀')
+    parser.add_argument('--allow-booking', action='store_true',
+                       help='profile 模式：发现车位时真正点击预订（默认只演练，不会预订）')
+    parser.add_argument('--source', choices=['screenshot', 'http', 'agent'],
+                       help='车位数据源（默认使用 Config.AVAILABILITY_SOURCE）')
+    parser.add_argument('--url', help='bench-http 模式：车位接口地址（不指定则使用本地模拟接口）')
+    parser.add_argument('--refresh', action='store_true',
+                       help='discover 模式：忽略设备清单中的缓存结果，重新探测全部设备')
+    parser.add_argument('--fleet', choices=['sqlite', 'redis'],
+                       help='启用集群协调并指定协调存储（默认使用 Config.FLEET_ENABLED / FLEET_STORE）')
+    parser.add_argument('--worker-id', help='集群协调中本节点的标识')
+    parser.add_argument('--log-sampling', action='store_true',
+                       help='按阶段对高频 INFO 日志采样（采样间隔见 Config.LOG_SAMPLE_RATES）')
+    parser.add_argument('--autostart', action='store_true', help='daemon 模式：启动后立即开始监控')
+    parser.add_argument('--command', default='stats',
+                       choices=['stats', 'start', 'stop', 'pause', 'resume', 'target', 'shutdown'],
+                       help='ctl 模式：发送给守护进程的命令')
+    parser.add_argument('--payload', default='{}',
+                       help='ctl 模式：命令参数 JSON，如 \'{"device": "127.0.0.1:5557"}\'')
     
     args = parser.parse_args()
     
     # 配置日志
-    setup_logging()
+    setup_logging(args.log_sampling)
     logger = logging.getLogger(__name__)
     
-    # 创建车位抢占器实例
+    if args.source:
+        Config.AVAILABILITY_SOURCE = args.source
+    if args.fleet:
+        Config.FLEET_ENABLED = True
+        Config.FLEET_STORE = args.fleet
+    if args.worker_id:
+        Config.FLEET_WORKER_ID = args.worker_id
+    
+    # 创建车位抢占器实例（OCR 依赖在首次使用识别器时才加载）
     grabber = ParkingGrabber()
     
+    if args.startup_probe:
+        from startup_bench import report_first_poll
+        grabber.first_poll_hook = report_first_poll
+    
     try:
+        if args.prewarm and args.mode in ('run', 'calibrate', 'test-ocr'):
+            # 校准模式不需要 OCR，只预热设备连接
+            grabber.prewarm(ocr=args.mode != 'calibrate')
+
         if args.mode == 'run':
             # 正常运行模式
             logger.info("启动车位抢占工具...")
@@ -57,6 +121,79 @@ def main():
             # OCR测试模式
             grabber.test_ocr()
             
+        elif args.mode == 'tune':
+            # OCR 参数调优模式
+            from ocr_tuner import OCRTuner
+            profile = OCRTuner(args.samples).tune(args.search, args.trials)
+            sys.exit(0 if profile else 1)
+            
+        elif args.mode == 'strike':
+            # 定时抢占模式
+            from timed_strike import parse_release_time
+            if not args.at:
+                parser.error('strike 模式需要 --at 指定释放时刻')
+            try:
+                release_time = parse_release_time(args.at)
+            except ValueError as e:
+                parser.error(f'--at: {e}')
+            success = grabber.strike(release_time, args.fire)
+            sys.exit(0 if success else 1)
+            
+        elif args.mode == 'timeline':
+            # 时间线查询模式
+            from timeline_store import TimelineStore, parse_time_arg
+            summary = TimelineStore().summarize(
+                parse_time_arg(args.since), parse_time_arg(args.until), args.device, args.lot, args.per_device
+            )
+            for key, value in summary.items():
+                print(f"{key}: {value}")
+            
+        elif args.mode == 'profile':
+            # 性能分析模式
+            from cycle_profiler import CycleProfiler
+            summary = CycleProfiler(args.replay, args.output, args.allow_booking).run(args.cycles)
+            sys.exit(0 if summary else 1)
+            
+        elif args.mode == 'daemon':
+            # 常驻守护进程模式
+            from grabber_daemon import GrabberDaemon
+            GrabberDaemon(grabber).serve_forever(prewarm=True, autostart=args.autostart)
+            
+        elif args.mode == 'ctl':
+            # 控制守护进程
+            import json
+            from grabber_daemon import send_command
+            response = send_command(args.command, json.loads(args.payload))
+            print(json.dumps(response, ensure_ascii=False, indent=2))
+            sys.exit(0 if response and response.get('ok', True) else 1)
+            
+        elif args.mode == 'mock-api':
+            # 本地模拟车位接口
+            from mock_availability_server import MockAvailabilityServer
+            MockAvailabilityServer().serve_forever()
+            
+        elif args.mode == 'bench-http':
+            # HTTP 数据源轮询耗时基准
+            from mock_availability_server import run_http_benchmark
+            run_http_benchmark(args.cycles, args.url)
+            
+        elif args.mode == 'discover':
+            # 设备发现与能力探测模式
+            from device_discovery import DeviceDiscovery
+            inventory = DeviceDiscovery().discover(args.refresh)
+            sys.exit(0 if inventory['devices'] else 1)
+            
+        elif args.mode == 'mini-redis':
+            # 迷你 Redis（集群协调测试用）
+            from mini_redis import MiniRedisServer
+            MiniRedisServer().run()
+            
+        elif args.mode == 'bench-startup':
+            # 启动耗时基准模式
+            from startup_bench import run_startup_benchmark
+            report = run_startup_benchmark(['run', 'calibrate', 'test-ocr'], args.repeats, args.prewarm)
+            sys.exit(0 if any('median_ms' in r for r in report.values()) else 1)
+            
     except KeyboardInterrupt:
         logger.info("用户中断程序")
         grabber.stop()
@@ -0,0 +1,177 @@
+"""
+迷你 Redis - 实现集群协调所需的最小 Redis 命令子集，用于没有 Redis 的环境测试多节点协调
+"""
+
+import time
+import fnmatch
+import logging
+import threading
+import socketserver
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+from fleet_coordination import COMPARE_AND_DELETE_SCRIPT
+
+
+class MiniRedis:
+    """迷你 Redis 数据类，支持 PING / SET（EX、PX、NX、XX）/ GET / DEL / KEYS 及释放租约用的 EVAL 脚本"""
+
+    def __init__(self):
+        """初始化数据"""
+        # 键 -> (值, 过期时间戳)
+        self.data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        """读取未过期的值（调用方持有锁），过期键惰性删除"""
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, args: List[str]) -> Any:
+        """
+        执行一条命令
+
+        Args:
+            args (List[str]): 命令及参数
+
+        Returns:
+            Any: 回复内容，异常表示错误回复
+        """
+        command = args[0].upper()
+        with self._lock:
+            if command == "PING":
+                return "PONG"
+            if command in ("AUTH", "SELECT"):
+                return "OK"
+            if command == "GET":
+                return self._get(args[1])
+            if command == "SET":
+                return self._set(args[1:])
+            if command == "DEL":
+                deleted = 0
+                for key in args[1:]:
+                    if self._get(key) is not None:
+                        del self.data[key]
+                        deleted += 1
+                return deleted
+            if command == "KEYS":
+                return [key for key in list(self.data) if fnmatch.fnmatchcase(key, args[1])
+                        and self._get(key) is not None]
+            if command == "EVAL":
+                if args[1] != COMPARE_AND_DELETE_SCRIPT:
+                    raise ValueError("ERR MiniRedis 只支持释放租约的比较删除脚本")
+                key, value = args[3], args[4]
+                if self._get(key) == value:
+                    del self.data[key]
+                    return 1
+                return 0
+        raise ValueError(f"ERR 不支持的命令 '{args[0]}'")
+
+    def _set(self, args: List[str]) -> Optional[str]:
+        """SET key value [EX 秒 | PX 毫秒] [NX | XX]（调用方持有锁）"""
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        expires = None
+        if "EX" in options:
+            expires = time.time() + float(args[2 + options.index("EX") + 1])
+        elif "PX" in options:
+            expires = time.time() + float(args[2 + options.index("PX") + 1]) / 1000
+
+        exists = self._get(key) is not None
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            return None
+        self.data[key] = (value, expires)
+        return "OK"
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """RESP 协议请求处理类"""
+
+    def _read_command(self) -> Optional[List[str]]:
+        """读取一条数组形式的命令，连接关闭时返回 None"""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # 内联命令（如 telnet 中直接输入 PING）
+            return line.decode("utf-8").split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def _encode(self, reply: Any) -> bytes:
+        """把回复编码为 RESP"""
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(self._encode(item) for item in reply)
+        if reply in ("OK", "PONG"):
+            return f"+{reply}\r\n".encode()
+        data = reply.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (ValueError, ConnectionError):
+                return
+            if args is None or (args and args[0].upper() == "QUIT"):
+                return
+            if not args:
+                continue
+            try:
+                response = self._encode(self.server.store.execute(args))
+            except (ValueError, IndexError) as e:
+                message = str(e) if str(e).startswith("ERR") else f"ERR {e}"
+                response = f"-{message}\r\n".encode("utf-8")
+            self.wfile.write(response)
+
+
+class MiniRedisServer(socketserver.ThreadingTCPServer):
+    """迷你 Redis 服务类"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = None, port: int = None):
+        """
+        初始化服务
+
+        Args:
+            host (str): 监听地址，默认使用 Config.FLEET_REDIS_HOST
+            port (int): 监听端口，默认使用 Config.FLEET_REDIS_PORT，0 表示随机端口
+        """
+        super().__init__((host or Config.FLEET_REDIS_HOST, Config.FLEET_REDIS_PORT if port is None else port),
+                         _RespHandler)
+        self.store = MiniRedis()
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> int:
+        """
+        在后台线程中运行服务
+
+        Returns:
+            int: 实际监听端口
+        """
+        threading.Thread(target=self.serve_forever, name="MiniRedis", daemon=True).start()
+        host, port = self.server_address[:2]
+        self.logger.info(f"迷你 Redis 已启动: {host}:{port}")
+        return port
+
+    def run(self):
+        """启动服务并阻塞运行，直到 Ctrl+C"""
+        host, port = self.server_address[:2]
+        self.logger.info(f"迷你 Redis 已启动: {host}:{port}")
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
@@ -0,0 +1,253 @@
+"""
+模拟车位接口 - 本地 HTTP 服务，按 ETag / Last-Modified 支持条件请求，用于测试和基准测试 HTTP 数据源
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+import statistics
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from config import Config
+from lot_registry import LotRegistry
+
+
+class MockAvailabilityServer:
+    """模拟车位接口类，维护各车场剩余车位数，并可按配置随机释放车位"""
+
+    def __init__(self, lots: List[str] = None, host: str = None, port: int = None,
+                 release_interval: float = None):
+        """
+        初始化模拟接口
+
+        Args:
+            lots (List[str]): 车场标识列表，默认使用配置中全部车场的 api_id
+            host (str): 监听地址，默认使用 Config.MOCK_API_HOST
+            port (int): 监听端口，默认使用 Config.MOCK_API_PORT，0 表示随机端口
+            release_interval (float): 平均释放间隔（秒），默认使用 Config.MOCK_API_RELEASE_INTERVAL
+        """
+        self.lots: Dict[str, int] = {
+            name: 0 for name in (lots or [lot.api_id for lot in LotRegistry.configured_lots()])
+        }
+        self.host = host or Config.MOCK_API_HOST
+        self.port = Config.MOCK_API_PORT if port is None else port
+        self.release_interval = Config.MOCK_API_RELEASE_INTERVAL if release_interval is None else release_interval
+        self.logger = logging.getLogger(__name__)
+        self.version = 0
+        self.modified_at = time.time()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    @property
+    def url(self) -> str:
+        """车位列表接口地址"""
+        return f"http://{self.host}:{self.port}/api/lots"
+
+    def set_counts(self, counts: Dict[str, int]):
+        """
+        更新车场剩余车位数，有变化时刷新 ETag / Last-Modified
+
+        Args:
+            counts (Dict[str, int]): 车场标识 -> 剩余车位数
+        """
+        with self._lock:
+            changed = {name: int(count) for name, count in counts.items() if self.lots.get(name) != int(count)}
+            if not changed:
+                return
+            self.lots.update(changed)
+            self.version += 1
+            self.modified_at = time.time()
+        self.logger.info(f"模拟接口车位变化: {changed}")
+
+    def snapshot(self, lot: str = None) -> tuple:
+        """
+        获取当前响应内容及其 ETag / Last-Modified
+
+        Args:
+            lot (str): 车场标识，None 表示全部车场
+
+        Returns:
+            tuple: (响应 JSON, ETag, Last-Modified 时间戳)，车场不存在时响应为 None
+        """
+        with self._lock:
+            if lot is None:
+                body = {"lots": {name: {"available": count} for name, count in self.lots.items()},
+                        "version": self.version}
+            elif lot in self.lots:
+                body = {"name": lot, "available": self.lots[lot], "version": self.version}
+            else:
+                body = None
+            return body, f'"v{self.version}"', self.modified_at
+
+    def _release_loop(self):
+        """随机释放车位，保持 MOCK_API_RELEASE_DURATION 秒后被抢光"""
+        while not self._stop_event.wait(random.expovariate(1 / self.release_interval)):
+            lot = random.choice(list(self.lots))
+            self.set_counts({lot: random.randint(1, 3)})
+            if self._stop_event.wait(Config.MOCK_API_RELEASE_DURATION):
+                break
+            self.set_counts({lot: 0})
+
+    def start(self) -> str:
+        """
+        在后台线程中启动服务
+
+        Returns:
+            str: 车位列表接口地址
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="MockAvailabilityServer", daemon=True).start()
+        if self.release_interval > 0:
+            threading.Thread(target=self._release_loop, name="MockRelease", daemon=True).start()
+        self.logger.info(f"模拟车位接口已启动: {self.url}（车场: {', '.join(self.lots)}）")
+        return self.url
+
+    def stop(self):
+        """停止服务"""
+        self._stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def serve_forever(self):
+        """启动服务并阻塞运行，直到 Ctrl+C"""
+        self.start()
+        try:
+            while not self._stop_event.wait(1):
+                pass
+        finally:
+            self.stop()
+
+
+def _make_handler(mock: MockAvailabilityServer):
+    """创建绑定到指定模拟接口的请求处理类"""
+
+    class AvailabilityHandler(BaseHTTPRequestHandler):
+        """模拟接口请求处理类: GET /api/lots[/<车场>]，POST /api/lots 设置车位数"""
+
+        # 保持连接，便于测试连接复用
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body: Any = None, headers: Dict[str, str] = None):
+            data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if body is not None:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _not_modified(self, etag: str, modified_at: float) -> bool:
+            """按 If-None-Match / If-Modified-Since 判断内容是否未变化"""
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                return etag in [tag.strip() for tag in if_none_match.split(",")]
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_modified_since:
+                try:
+                    return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def do_GET(self):
+            if Config.MOCK_API_LATENCY:
+                time.sleep(Config.MOCK_API_LATENCY)
+
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if parts[:2] != ["api", "lots"] or len(parts) > 3:
+                self._reply(404, {"message": "仅支持 /api/lots 和 /api/lots/<车场>"})
+                return
+
+            body, etag, modified_at = mock.snapshot(parts[2] if len(parts) == 3 else None)
+            if body is None:
+                self._reply(404, {"message": f"未知车场: {parts[2]}"})
+                return
+
+            headers = {"ETag": etag, "Last-Modified": formatdate(modified_at, usegmt=True),
+                       "Cache-Control": "no-cache"}
+            if self._not_modified(etag, modified_at):
+                self._reply(304, headers=headers)
+            else:
+                self._reply(200, body, headers)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                counts = json.loads(self.rfile.read(length) or b"{}")
+                mock.set_counts(counts)
+            except (ValueError, TypeError, AttributeError):
+                self._reply(400, {"message": "请求体需要为 {车场: 车位数}"})
+                return
+            self._reply(200, mock.snapshot()[0])
+
+        def log_message(self, format, *args):
+            mock.logger.debug(f"模拟接口请求: {format % args}")
+
+    return AvailabilityHandler
+
+
+def run_http_benchmark(polls: int = 100, url: str = None) -> Dict[str, Any]:
+    """
+    对比 HTTP 数据源（连接复用 + 条件请求）与每次新建连接的完整请求的轮询耗时
+
+    未指定 url 时在本进程内启动一个随机端口的模拟接口（不自动释放车位）。
+
+    Args:
+        polls (int): 每种方式的轮询次数
+        url (str): 车位接口地址，默认使用本地模拟接口
+
+    Returns:
+        Dict[str, Any]: 每种方式的耗时中位数 / P95 及 304 次数
+    """
+    import requests
+    from parking_grabber import HttpSource
+
+    logger = logging.getLogger(__name__)
+    lots = LotRegistry.configured_lots()
+    mock = None
+    if url is None:
+        mock = MockAvailabilityServer([lot.api_id for lot in lots], port=0, release_interval=0)
+        url = mock.start()
+
+    def measure(poll) -> Dict[str, Any]:
+        timings = []
+        for _ in range(max(polls, 1)):
+            start = time.perf_counter()
+            poll()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        }
+
+    source = HttpSource(url)
+
+    def fresh_poll():
+        # 对照组: 每次新建连接、不带条件请求头
+        for request_url in {url.replace("{lot}", lot.api_id) for lot in lots}:
+            requests.get(request_url, headers={"Connection": "close"},
+                         timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)).json()
+
+    try:
+        report = {
+            "pooled_conditional": {**measure(lambda: source.read(lots)), **source.get_stats()},
+            "fresh_connection": measure(fresh_poll),
+        }
+    finally:
+        source.close()
+        if mock is not None:
+            mock.stop()
+
+    for name, result in report.items():
+        logger.info(f"{name}: {result}")
+    return report
@@ -0,0 +1,243 @@
+"""
+OCR 参数调优器 - 在已标注的 ROI 截图上搜索最优预处理与 OCR 参数
+"""
+
+import os
+import re
+import time
+import random
+import itertools
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+
+from config import Config
+from image_recognizer import ImageRecognizer
+from utils import Utils
+
+# 参数搜索空间
+SEARCH_SPACE = {
+    "blur_kernel": [0, 3, 5],
+    "block_size": [7, 11, 15, 21, 31],
+    "c": [0, 2, 4, 6],
+    "scale": [1, 2, 3, 4],
+    "psm": [7, 8, 13],
+}
+
+# 支持的样本图像扩展名
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class OCRTuner:
+    """OCR 参数调优器类，按准确率和单帧耗时评估候选参数并输出帕累托最优方案"""
+
+    def __init__(self, samples_dir: str = None):
+        """
+        初始化调优器
+
+        Args:
+            samples_dir (str): 已标注 ROI 截图目录，默认使用配置中的路径
+        """
+        self.samples_dir = samples_dir or Config.TUNE_SAMPLES_DIR
+        self.recognizer = ImageRecognizer()
+        self.logger = logging.getLogger(__name__)
+
+    def load_samples(self) -> List[Tuple[str, Any, int]]:
+        """
+        加载已标注样本
+
+        标签来源优先使用目录下的 labels.json（文件名 -> 数字），
+        否则从文件名开头的数字解析，例如 "12_0930.png" 的标签为 12。
+
+        Returns:
+            List[Tuple[str, Any, int]]: (文件名, ROI 图像, 标签) 列表
+        """
+        if not os.path.isdir(self.samples_dir):
+            self.logger.error(f"样本目录不存在: {self.samples_dir}")
+            return []
+
+        labels = Utils.load_config(os.path.join(self.samples_dir, "labels.json")) or {}
+        samples = []
+
+        for name in sorted(os.listdir(self.samples_dir)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+
+            label = labels.get(name)
+            if label is None:
+                match = re.match(r"(\d+)", name)
+                if not match:
+                    self.logger.warning(f"无法确定样本标签，已跳过: {name}")
+                    continue
+                label = match.group(1)
+
+            image = cv2.imread(os.path.join(self.samples_dir, name))
+            if image is None:
+                self.logger.warning(f"无法读取样本图像，已跳过: {name}")
+                continue
+
+            samples.append((name, image, int(label)))
+
+        self.logger.info(f"已加载 {len(samples)} 个标注样本")
+        return samples
+
+    def generate_candidates(self, search: str = "grid", trials: int = 50,
+                            seed: int = None) -> List[Dict[str, Any]]:
+        """
+        生成候选参数组合
+
+        Args:
+            search (str): 搜索方式，"grid" 为网格搜索，"random" 为随机搜索
+            trials (int): 随机搜索的候选数量
+            seed (int): 随机种子
+
+        Returns:
+            List[Dict[str, Any]]: 候选参数列表（始终包含当前默认参数）
+        """
+        names = list(SEARCH_SPACE)
+        grid = [dict(zip(names, values))
+                for values in itertools.product(*(SEARCH_SPACE[n] for n in names))]
+
+        if search == "random":
+            rng = random.Random(seed)
+            grid = rng.sample(grid, min(trials, len(grid)))
+
+        baseline = ImageRecognizer.default_params()
+        if baseline not in grid:
+            grid.insert(0, baseline)
+
+        return grid
+
+    def evaluate(self, params: Dict[str, Any],
+                 samples: List[Tuple[str, Any, int]]) -> Dict[str, Any]:
+        """
+        评估一组参数的准确率和单帧耗时
+
+        Args:
+            params (Dict[str, Any]): 候选参数
+            samples (List[Tuple[str, Any, int]]): 标注样本
+
+        Returns:
+            Dict[str, Any]: 评估结果，包含 params、accuracy、ms_per_frame
+        """
+        correct = 0
+        start = time.perf_counter()
+
+        for _, roi, label in samples:
+            if self.recognizer.recognize_roi(roi, params) == label:
+                correct += 1
+
+        elapsed = time.perf_counter() - start
+
+        return {
+            "params": params,
+            "accuracy": correct / max(len(samples), 1),
+            "ms_per_frame": elapsed * 1000 / max(len(samples), 1),
+        }
+
+    @staticmethod
+    def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        计算准确率（越高越好）与耗时（越低越好）的帕累托前沿
+
+        Args:
+            results (List[Dict[str, Any]]): 评估结果列表
+
+        Returns:
+            List[Dict[str, Any]]: 前沿上的结果，按耗时升序
+        """
+        front = []
+        best_accuracy = -1.0
+
+        # 按耗时升序扫描，只有准确率严格提升的结果才不被支配
+        for result in sorted(results, key=lambda r: (r["ms_per_frame"], -r["accuracy"])):
+            if result["accuracy"] > best_accuracy:
+                front.append(result)
+                best_accuracy = result["accuracy"]
+
+        return front
+
+    @staticmethod
+    def select_best(front: List[Dict[str, Any]], tolerance: float = None) -> Optional[Dict[str, Any]]:
+        """
+        在帕累托前沿中选出仍满足准确率要求的最快方案
+
+        Args:
+            front (List[Dict[str, Any]]): 帕累托前沿
+            tolerance (float): 允许相对最高准确率的下降幅度
+
+        Returns:
+            Optional[Dict[str, Any]]: 选中的结果，前沿为空时返回 None
+        """
+        if not front:
+            return None
+
+        if tolerance is None:
+            tolerance = Config.TUNE_ACCURACY_TOLERANCE
+
+        best_accuracy = max(r["accuracy"] for r in front)
+        eligible = [r for r in front if r["accuracy"] >= best_accuracy - tolerance]
+        return min(eligible, key=lambda r: r["ms_per_frame"])
+
+    def tune(self, search: str = "grid", trials: int = 50, seed: int = None,
+             output_path: str = None) -> Optional[Dict[str, Any]]:
+        """
+        执行参数调优并保存最优方案
+
+        Args:
+            search (str): 搜索方式，"grid" 或 "random"
+            trials (int): 随机搜索的候选数量
+            seed (int): 随机种子
+            output_path (str): 输出文件路径，默认使用配置中的路径
+
+        Returns:
+            Optional[Dict[str, Any]]: 写入的调优结果，失败时返回 None
+        """
+        if output_path is None:
+            output_path = Config.OCR_PROFILE_PATH
+
+        samples = self.load_samples()
+        if not samples:
+            self.logger.error("没有可用的标注样本，调优终止")
+            return None
+
+        candidates = self.generate_candidates(search, trials, seed)
+        self.logger.info(f"开始调优: {len(candidates)} 组候选参数 x {len(samples)} 个样本")
+
+        results = []
+        for index, params in enumerate(candidates, 1):
+            result = self.evaluate(params, samples)
+            results.append(result)
+            self.logger.debug(
+                f"[{index}/{len(candidates)}] {params} "
+                f"准确率 {result['accuracy']:.1%} 耗时 {result['ms_per_frame']:.1f}ms"
+            )
+
+        front = self.pareto_front(results)
+        best = self.select_best(front)
+
+        for result in front:
+            self.logger.info(
+                f"帕累托前沿: 准确率 {result['accuracy']:.1%} "
+                f"耗时 {result['ms_per_frame']:.1f}ms {result['params']}"
+            )
+
+        profile = {
+            "params": best["params"],
+            "accuracy": best["accuracy"],
+            "ms_per_frame": best["ms_per_frame"],
+            "samples": len(samples),
+            "search": search,
+            "pareto_front": front,
+            "generated_at": Utils.get_timestamp(),
+        }
+
+        if not Utils.save_config(profile, output_path):
+            return None
+
+        self.logger.info(
+            f"最优参数已保存到 {output_path}: 准确率 {best['accuracy']:.1%} "
+            f"耗时 {best['ms_per_frame']:.1f}ms {best['params']}"
+        )
+        return profile
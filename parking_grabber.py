@@ -2,22 +2,329 @@
 车位抢占自动化工具 - 主要业务逻辑
 """
 
+import re
 import time
 import logging
-from typing import Optional
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+from typing import Optional, Callable, Dict, List, Any
 from adb_controller import ADBController
-from image_recognizer import ImageRecognizer
+from device_watchdog import DeviceWatchdog, ShellChannel
+from lot_registry import LotRegistry, ParkingLot, DEFAULT_LOT_NAME
+from timed_strike import ClockSync, precise_wait_until
+from timeline_store import TimelineStore
+from utils import Statistics
 from config import Config
 
+# HTTP_COUNT_PATH 中 "key[field=value]" 形式的列表筛选段
+_PATH_FILTER = re.compile(r"^(?P<key>[^\[]*)\[(?P<field>[^=\]]+)=(?P<value>[^\]]*)\]$")
+
+
+class AvailabilitySource(ABC):
+    """车位数据源基类，读取各车场的剩余车位数"""
+    
+    # read() 之前是否需要先进入车位页面（需要时由抢占器负责点击进入和返回）
+    requires_page = True
+    
+    @abstractmethod
+    def read(self, lots: List[ParkingLot]) -> Dict[str, Optional[int]]:
+        """
+        读取各车场剩余车位数
+        
+        Args:
+            lots (List[ParkingLot]): 要读取的车场
+            
+        Returns:
+            Dict[str, Optional[int]]: 车场名称 -> 剩余车位数，读取失败的车场为 None
+        """
+    
+    def confidence(self, lot_name: str) -> float:
+        """最近一次读取结果的置信度，未知时为 NaN"""
+        return float("nan")
+    
+    @property
+    @abstractmethod
+    def origin(self) -> str:
+        """数据来源标识，记录时间线时作为设备名称"""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """数据源统计"""
+        return {}
+    
+    def close(self):
+        """释放数据源占用的资源"""
+
+
+class ScreenshotSource(AvailabilitySource):
+    """截图数据源类，在车位页面截图并 OCR 识别各车场的车位数"""
+    
+    requires_page = True
+    
+    def __init__(self, grabber: "ParkingGrabber"):
+        """
+        初始化截图数据源
+        
+        Args:
+            grabber (ParkingGrabber): 所属抢占器（使用其 ADB 控制器和识别器）
+        """
+        self.grabber = grabber
+        self.logger = logging.getLogger(__name__)
+    
+    @property
+    def origin(self) -> str:
+        return self.grabber.adb.device_id
+    
+    def read(self, lots: List[ParkingLot]) -> Dict[str, Optional[int]]:
+        """一次截图、一次识别覆盖所有车场，识别失败的车场保存调试图像"""
+        if not self.grabber.adb.take_screenshot():
+            self.logger.error("截图失败")
+            return {lot.name: None for lot in lots}
+        
+        recognizer = self.grabber.recognizer
+        counts = recognizer.extract_lot_counts(Config.SCREENSHOT_PATH, lots)
+        
+        for lot in lots:
+            if counts[lot.name] is None:
+                output_path = "debug_roi.png" if lot.name == DEFAULT_LOT_NAME else f"debug_roi_{lot.name}.png"
+                recognizer.save_debug_image(Config.SCREENSHOT_PATH, output_path, lot.region)
+        
+        return counts
+    
+    def confidence(self, lot_name: str) -> float:
+        return self.grabber.recognizer.last_confidences.get(lot_name, float("nan"))
+
+
+class HttpSource(AvailabilitySource):
+    """HTTP 数据源类，直接轮询车位接口，无需操作界面和 OCR
+    
+    使用保持连接的会话和连接池，并通过 ETag / Last-Modified 发送条件请求，
+    接口返回 304 时复用上一次的响应内容。
+    """
+    
+    requires_page = False
+    
+    def __init__(self, url: str = None, count_path: str = None, headers: Dict[str, str] = None):
+        """
+        初始化 HTTP 数据源
+        
+        Args:
+            url (str): 接口地址，可含 {lot}，默认使用 Config.HTTP_SOURCE_URL
+            count_path (str): 车位数在响应 JSON 中的路径，默认使用 Config.HTTP_COUNT_PATH
+            headers (Dict[str, str]): 额外请求头，默认使用 Config.HTTP_SOURCE_HEADERS
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.url = url or Config.HTTP_SOURCE_URL
+        self.count_path = count_path or Config.HTTP_COUNT_PATH
+        self.logger = logging.getLogger(__name__)
+        
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json", **(headers or Config.HTTP_SOURCE_HEADERS)})
+        adapter = HTTPAdapter(pool_connections=Config.HTTP_POOL_SIZE, pool_maxsize=Config.HTTP_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # 地址 -> (ETag, Last-Modified, 已解析的响应)
+        self._cache: Dict[str, tuple] = {}
+        self.stats = {"requests": 0, "not_modified": 0, "errors": 0, "total_ms": 0.0}
+    
+    @property
+    def origin(self) -> str:
+        return urlparse(self.url).netloc or self.url
+    
+    def _fetch(self, url: str) -> Optional[Any]:
+        """
+        发送条件请求并返回解析后的 JSON，未变化时返回缓存内容
+        
+        Args:
+            url (str): 请求地址
+            
+        Returns:
+            Optional[Any]: 响应 JSON，请求失败时返回 None
+        """
+        etag, last_modified, cached = self._cache.get(url, (None, None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        try:
+            response = self.session.get(
+                url, headers=headers, timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+            )
+            if response.status_code == 304 and cached is not None:
+                self.stats["not_modified"] += 1
+                return cached
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.logger.warning(f"车位接口请求失败: {url}: {e}")
+            return None
+        finally:
+            self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+        
+        self._cache[url] = (response.headers.get("ETag"), response.headers.get("Last-Modified"), data)
+        return data
+    
+    @staticmethod
+    def extract_count(data: Any, path: str) -> Optional[int]:
+        """
+        按路径从 JSON 中取出车位数
+        
+        Args:
+            data (Any): 响应 JSON
+            path (str): 以 "." 分隔的路径，支持列表下标和 "key[field=value]" 筛选
+            
+        Returns:
+            Optional[int]: 车位数，路径不存在、节点类型与路径不符或不是数字时返回 None
+        """
+        node = data
+        for segment in path.split("."):
+            match = _PATH_FILTER.match(segment)
+            if match:
+                if match["key"]:
+                    node = node.get(match["key"]) if isinstance(node, dict) else None
+                if not isinstance(node, list):
+                    return None
+                node = next(
+                    (item for item in node
+                     if isinstance(item, dict) and str(item.get(match["field"])) == match["value"]),
+                    None
+                )
+            elif isinstance(node, list) and segment.lstrip("-").isdigit():
+                index = int(segment)
+                node = node[index] if -len(node) <= index < len(node) else None
+            elif isinstance(node, dict):
+                node = node.get(segment)
+            else:
+                node = None
+            if node is None:
+                return None
+        
+        try:
+            return int(node)
+        except (TypeError, ValueError):
+            return None
+    
+    def read(self, lots: List[ParkingLot]) -> Dict[str, Optional[int]]:
+        """按地址分组请求，同一地址的多个车场只请求一次"""
+        responses: Dict[str, Any] = {}
+        counts = {}
+        for lot in lots:
+            url = self.url.replace("{lot}", lot.api_id)
+            if url not in responses:
+                responses[url] = self._fetch(url)
+            data = responses[url]
+            counts[lot.name] = None if data is None else \
+                self.extract_count(data, self.count_path.replace("{lot}", lot.api_id))
+        return counts
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """请求次数、304 次数、失败次数及平均耗时"""
+        stats = dict(self.stats)
+        stats["avg_ms"] = round(stats.pop("total_ms") / stats["requests"], 2) if stats["requests"] else 0
+        return stats
+    
+    def close(self):
+        """关闭会话及连接池"""
+        self.session.close()
+
+
+def create_source(grabber: "ParkingGrabber", kind: str = None) -> AvailabilitySource:
+    """
+    按配置创建车位数据源
+    
+    Args:
+        grabber (ParkingGrabber): 所属抢占器
+        kind (str): "screenshot"、"http" 或 "agent"，默认使用 Config.AVAILABILITY_SOURCE
+        
+    Returns:
+        AvailabilitySource: 车位数据源
+    """
+    kind = kind or Config.AVAILABILITY_SOURCE
+    if kind == "http":
+        return HttpSource()
+    if kind == "agent":
+        from device_agent import DeviceAgentSource
+        return DeviceAgentSource(grabber)
+    if kind != "screenshot":
+        raise ValueError(f"未知的车位数据源: {kind}")
+    return ScreenshotSource(grabber)
+
+
 class ParkingGrabber:
     """车位抢占器类，实现主要的自动化逻辑"""
     
     def __init__(self):
         """初始化车位抢占器"""
         self.adb = ADBController()
-        self.recognizer = ImageRecognizer()
+        self._recognizer = None
+        self.lots = LotRegistry()
+        self.source = create_source(self)
+        self.timeline = TimelineStore() if Config.TIMELINE_ENABLED else None
+        self.fleet = None
+        if Config.FLEET_ENABLED:
+            from fleet_coordination import FleetCoordinator
+            self.fleet = FleetCoordinator()
         self.logger = logging.getLogger(__name__)
         self.is_running = False
+        self.is_paused = False
+        self.booked = False
+        self.device_connected = False
+        # 最近一次进入车位页面的时间（time.monotonic）
+        self.page_opened_at = 0.0
+        self.stats = Statistics()
+        self.watchdog: Optional[DeviceWatchdog] = None
+        # 用于在暂停 / 停止 / 切换目标时提前结束等待
+        self._wake = threading.Event()
+        # 启动阶段钩子（用于启动耗时基准测试），参数为阶段: "poll" 首次轮询设备前，"reading" 首个读数返回后
+        self.first_poll_hook: Optional[Callable[[str], None]] = None
+        self._first_poll_notified = False
+    
+    @property
+    def recognizer(self):
+        """图像识别器，首次访问时才加载 OpenCV / Tesseract 等 OCR 依赖"""
+        if self._recognizer is None:
+            from image_recognizer import ImageRecognizer
+            self._recognizer = ImageRecognizer()
+        return self._recognizer
+    
+    def prewarm(self, ocr: bool = True) -> bool:
+        """
+        预热：在首次轮询前连接设备并加载 OCR 模型
+        
+        Args:
+            ocr (bool): 是否同时预热 OCR 识别链路
+            
+        Returns:
+            bool: 设备连接是否成功
+        """
+        start = time.perf_counter()
+        self.device_connected = self.adb.connect_device()
+        
+        if ocr:
+            self.recognizer.warm_up()
+        
+        self.logger.info(f"预热完成，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return self.device_connected
+    
+    def _notify_first_poll(self):
+        """首次轮询前调用一次钩子"""
+        if self.first_poll_hook is not None and not self._first_poll_notified:
+            self._first_poll_notified = True
+            self.first_poll_hook("poll")
+    
+    def _notify_first_reading(self):
+        """首个读数返回后调用一次钩子（此时已包含按需加载 OCR 依赖的开销）"""
+        hook, self.first_poll_hook = self.first_poll_hook, None
+        if hook is not None:
+            hook("reading")
         
     def start(self) -> bool:
         """
@@ -28,8 +335,8 @@ class ParkingGrabber:
         """
         self.logger.info("=== 车位抢占工具启动 ===")
         
-        # 连接设备
-        if not self.adb.connect_device():
+        # 连接设备（已预热时跳过）
+        if not self.device_connected and not self.adb.connect_device():
             self.logger.error("无法连接到安卓设备，程序退出")
             return False
         
@@ -38,19 +345,48 @@ class ParkingGrabber:
             self.logger.error("设备未正确连接，程序退出")
             return False
         
+        self.device_connected = True
         self.is_running = True
+        self.booked = False
+        self._wake.clear()
         self.logger.info("开始监控车位...")
         
+        if Config.WATCHDOG_ENABLED:
+            self.watchdog = DeviceWatchdog(self.adb)
+            self.watchdog.start()
+        
         try:
             while self.is_running:
+                if self.is_paused:
+                    self._wait(Config.WAIT_BETWEEN_CHECKS)
+                    continue
+                
+                # 设备恢复期间暂停循环，避免空耗超时
+                if not self.adb.device_ready.is_set():
+                    self.logger.info("设备恢复中，暂停监控...")
+                    while self.is_running and not self.adb.device_ready.wait(1):
+                        pass
+                    continue
+                
+                if self.fleet is not None:
+                    self.fleet.heartbeat()
+                if self._booked_elsewhere():
+                    break
+                
+                self._notify_first_poll()
                 success = self._attempt_booking()
+                self.stats.record_attempt(success)
                 
                 if success:
+                    self.booked = True
                     self.logger.info("🎉 车位预订成功！程序结束")
                     break
                 else:
-                    self.logger.info(f"暂无车位，等待 {Config.WAIT_BETWEEN_CHECKS} 秒后重试...")
-                    time.sleep(Config.WAIT_BETWEEN_CHECKS)
+                    # 集群中各节点按时隙错开轮询
+                    wait = Config.WAIT_BETWEEN_CHECKS if self.fleet is None else \
+                        self.fleet.next_poll_delay(Config.WAIT_BETWEEN_CHECKS)
+                    self.logger.info(f"暂无车位，等待 {wait:.1f} 秒后重试...")
+                    self.stats.add_wait_time(self._wait(wait))
                     
         except KeyboardInterrupt:
             self.logger.info("用户中断程序")
@@ -58,14 +394,62 @@ class ParkingGrabber:
         except Exception as e:
             self.logger.error(f"程序运行时发生错误: {e}")
             return False
+        finally:
+            if self.watchdog is not None:
+                self.watchdog.stop()
+                self.watchdog = None
+            self.logger.info(f"ADB 调用统计: {self.adb.get_stats()}")
+            if self.source.get_stats():
+                self.logger.info(f"数据源统计: {self.source.get_stats()}")
+            self.source.close()
+            if self.fleet is not None:
+                self.logger.info(f"集群协调统计: {self.fleet.get_stats()}")
+                self.fleet.leave()
         
         return True
     
     def stop(self):
         """停止车位抢占程序"""
         self.is_running = False
+        self._wake.set()
         self.logger.info("程序已停止")
     
+    def pause(self):
+        """暂停监控，当前周期结束后不再发起新的检查"""
+        self.is_paused = True
+        self.logger.info("监控已暂停")
+    
+    def resume(self):
+        """恢复监控，立即开始下一次检查"""
+        self.is_paused = False
+        self._wake.set()
+        self.logger.info("监控已恢复")
+    
+    def wake(self):
+        """提前结束当前等待，立即开始下一次检查"""
+        self._wake.set()
+    
+    def _wait(self, seconds: float) -> float:
+        """
+        可被 stop / pause / resume 提前唤醒的等待
+        
+        按 1 秒分段等待，保证 Windows 下 Ctrl+C 能及时响应。
+        
+        Args:
+            seconds (float): 最长等待时间（秒）
+            
+        Returns:
+            float: 实际等待的秒数
+        """
+        start = time.monotonic()
+        deadline = start + seconds
+        while self.is_running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._wake.wait(min(1.0, remaining)):
+                break
+        self._wake.clear()
+        return time.monotonic() - start
+    
     def _attempt_booking(self) -> bool:
         """
         尝试预订车位的完整流程
@@ -73,35 +457,136 @@ class ParkingGrabber:
         Returns:
             bool: 是否成功预订
         """
+        # 本周期内所有 ADB 调用共享同一个截止时间
+        self.adb.begin_cycle()
+        
+        on_page = False
+        
         try:
-            # 步骤1: 点击"车位临停"按钮
-            if not self._click_parking_button():
-                return False
-            
-            # 步骤2: 等待页面加载
-            time.sleep(Config.PAGE_LOAD_DELAY)
+            # 步骤1: 其他节点刚观测过时直接使用其结果，免去本节点的页面操作和识别
+            counts = self._shared_counts()
             
-            # 步骤3: 截图并检查车位数量
-            parking_count = self._check_parking_availability()
+            if counts is None:
+                # 截图类数据源需要先进入车位页面
+                if self.source.requires_page:
+                    if not self._open_parking_page():
+                        return False
+                    on_page = True
+                
+                # 步骤2: 检查各车场车位数量
+                counts = self._check_parking_availability()
             
-            if parking_count is None:
-                self.logger.warning("无法识别车位数量，返回上一页")
-                self._go_back()
+            if all(count is None for count in counts.values()):
+                self.logger.warning("无法识别车位数量")
+                if on_page:
+                    self._go_back()
                 return False
             
-            # 步骤4: 根据车位数量决定操作
-            if parking_count > 0:
-                self.logger.info(f"发现可用车位 {parking_count} 个，尝试预订...")
-                return self._book_parking()
+            # 步骤3: 按优先级规则选出车场并决定操作
+            lot = self.lots.select_best(counts)
+            if lot is not None:
+                self.logger.info(f"发现可用车位 {counts[lot.name]} 个（{lot.name}），尝试预订...")
+                # 预订操作不受周期截止时间限制
+                self.adb.end_cycle()
+                
+                def book() -> bool:
+                    nonlocal on_page
+                    if not (on_page or self._open_parking_page()):
+                        return False
+                    on_page = True
+                    return self._book_parking(lot)
+                
+                booked = self._book_with_lease(lot, book)
+                if booked is None:
+                    if on_page:
+                        self._go_back()
+                    return False
+                return booked
             else:
-                self.logger.info("暂无可用车位，返回上一页")
-                self._go_back()
+                self.logger.info("暂无可用车位" + ("，返回上一页" if on_page else ""))
+                if on_page:
+                    self._go_back()
                 return False
                 
         except Exception as e:
             self.logger.error(f"预订流程中发生错误: {e}")
-            self._go_back()  # 确保返回到主页面
+            if on_page:
+                self._go_back()  # 确保返回到主页面
+            return False
+        finally:
+            self.adb.end_cycle()
+    
+    def _book_with_lease(self, lot: ParkingLot, book: Callable[[], bool]) -> Optional[bool]:
+        """
+        在集群租约保护下执行预订：先获取车场租约，预订成功后通知其他节点，失败时释放租约
+        
+        Args:
+            lot (ParkingLot): 要预订的车场
+            book (Callable[[], bool]): 实际的预订操作
+            
+        Returns:
+            Optional[bool]: 是否预订成功，租约被其他节点持有时返回 None（未执行预订）
+        """
+        if self.fleet is not None and not self.fleet.claim(lot.name):
+            return None
+        
+        booked = False
+        try:
+            booked = book()
+            return booked
+        finally:
+            if self.fleet is not None:
+                if booked:
+                    self.fleet.mark_booked(lot.name)
+                else:
+                    self.fleet.release(lot.name)
+    
+    def _booked_elsewhere(self) -> bool:
+        """
+        查询集群中是否已有其他节点预订成功
+        
+        Returns:
+            bool: 是否已由其他节点预订
+        """
+        if self.fleet is None:
+            return False
+        booked = self.fleet.booked_by_other()
+        if booked is not None:
+            self.logger.info(f"节点 {booked['worker']} 已预订成功（{booked['lot']}），停止抢占")
+        return booked is not None
+    
+    def _shared_counts(self) -> Optional[Dict[str, Optional[int]]]:
+        """
+        获取其他节点对全部启用车场的新鲜观测结果
+        
+        Returns:
+            Optional[Dict[str, Optional[int]]]: 车场名称 -> 车位数量，未启用集群协调或没有新鲜结果时返回 None
+        """
+        if self.fleet is None:
+            return None
+        
+        counts = self.fleet.fresh_observations([lot.name for lot in self.lots.lots])
+        if counts is not None:
+            self._notify_first_reading()
+            self.logger.info(f"使用其他节点的最新观测结果，跳过本次识别: {counts}")
+        return counts
+    
+    def _open_parking_page(self) -> bool:
+        """
+        点击"车位临停"按钮并等待页面加载
+        
+        Returns:
+            bool: 点击是否成功
+        """
+        if not self._click_parking_button():
             return False
+        self._wait_page_loaded()
+        return True
+    
+    def _wait_page_loaded(self):
+        """点击进入车位页面后等待页面加载，并记录进入时间（设备端代理据此判断上报是否来自新页面）"""
+        time.sleep(Config.PAGE_LOAD_DELAY)
+        self.page_opened_at = time.monotonic()
     
     def _click_parking_button(self) -> bool:
         """
@@ -120,39 +605,43 @@ class ParkingGrabber:
             
         return success
     
-    def _check_parking_availability(self) -> Optional[int]:
+    def _check_parking_availability(self) -> Dict[str, Optional[int]]:
         """
-        检查车位可用性
+        通过车位数据源检查各车场车位可用性，一次读取覆盖所有启用的车场
         
         Returns:
-            Optional[int]: 可用车位数量，识别失败时返回 None
+            Dict[str, Optional[int]]: 车场名称 -> 可用车位数量，识别失败的车场为 None
         """
-        # 截图
-        if not self.adb.take_screenshot():
-            self.logger.error("截图失败")
-            return None
+        lots = self.lots.lots
+        counts = self.source.read(lots)
+        observed_at = time.time()
+        self._notify_first_reading()
         
-        # 识别车位数量
-        parking_count = self.recognizer.extract_parking_count(Config.SCREENSHOT_PATH)
-        
-        if parking_count is not None:
-            self.logger.info(f"当前剩余车位: {parking_count}")
-        else:
-            self.logger.warning("无法识别车位数量")
-            # 保存调试图像
-            self.recognizer.save_debug_image(Config.SCREENSHOT_PATH)
+        for lot in lots:
+            if counts[lot.name] is not None:
+                self.logger.info(f"当前剩余车位: {counts[lot.name]}（{lot.name}）")
+                if self.timeline is not None:
+                    self.timeline.append(observed_at, self.source.origin, lot.name, counts[lot.name],
+                                         self.source.confidence(lot.name))
+                if self.fleet is not None:
+                    self.fleet.share_observation(lot.name, counts[lot.name], self.source.confidence(lot.name))
+            else:
+                self.logger.warning(f"无法识别车位数量（{lot.name}）")
         
-        return parking_count
+        return counts
     
-    def _book_parking(self) -> bool:
+    def _book_parking(self, lot: ParkingLot) -> bool:
         """
         执行车位预订操作
         
+        Args:
+            lot (ParkingLot): 要预订的车场
+            
         Returns:
             bool: 预订是否成功
         """
-        # 点击"立即预订"按钮
-        x, y = Config.BOOK_NOW_BUTTON_COORDS
+        # 点击该车场的"立即预订"按钮
+        x, y = lot.book_coords
         success = self.adb.click(x, y)
         
         if success:
@@ -186,16 +675,151 @@ class ParkingGrabber:
             
         return success
     
+    def strike(self, release_time: float, fire: str = "refresh") -> bool:
+        """
+        定时抢占：在已知的释放时刻准时刷新并预订
+        
+        提前 STRIKE_LEAD_TIME 秒同步设备时钟并进入车位页面，
+        到点时通过常驻 shell 立即发出第一个操作并记录实际时间误差。
+        
+        Args:
+            release_time (float): 释放时刻（设备时钟的 Unix 时间戳）
+            fire (str): "refresh" 到点返回并重新进入页面、识别后预订；
+                "blind" 到点直接点击最高优先级车场的预订按钮
+            
+        Returns:
+            bool: 是否成功预订
+        """
+        self.logger.info("=== 定时抢占模式 ===")
+        
+        if not self.device_connected and not self.adb.connect_device():
+            self.logger.error("无法连接到设备")
+            return False
+        self.device_connected = True
+        self.is_running = True
+        
+        channel = ShellChannel(self.adb.device_id)
+        if not channel.open():
+            return False
+        
+        try:
+            clock = ClockSync(channel)
+            if clock.measure() is None:
+                return False
+            
+            if fire == "refresh":
+                self.recognizer.warm_up()
+            
+            # 等到释放前 STRIKE_LEAD_TIME 秒再做最后一次校时和页面预导航
+            lead_at = clock.to_host_time(release_time) - Config.STRIKE_LEAD_TIME
+            self.logger.info(f"等待释放时刻，距离预导航还有 {max(lead_at - time.time(), 0):.1f} 秒")
+            while self.is_running:
+                remaining = lead_at - time.time()
+                if remaining <= 0:
+                    break
+                time.sleep(min(1.0, remaining))
+            if not self.is_running:
+                return False
+            
+            # 集群中已有节点预订成功时不再预导航
+            if self.fleet is not None:
+                self.fleet.heartbeat()
+            if self._booked_elsewhere():
+                return False
+            
+            clock.measure()
+            self._notify_first_poll()
+            if not self._click_parking_button():
+                return False
+            self._wait_page_loaded()
+            
+            # 换算为单调时钟上的目标时刻，之后不再受系统时间校正影响
+            host_fire_at = clock.to_host_time(release_time) + Config.STRIKE_FIRE_OFFSET
+            target = time.perf_counter() + (host_fire_at - time.time())
+            
+            if fire == "blind":
+                lot = min(self.lots.lots, key=lambda lot: lot.priority)
+                command = f"input tap {lot.book_coords[0]} {lot.book_coords[1]}"
+            else:
+                command = "input keyevent KEYCODE_BACK"
+            
+            def trigger() -> bool:
+                fired_at = precise_wait_until(target)
+                done = channel.run(command, Config.ADB_COMMAND_TIMEOUT)
+                finished_at = time.perf_counter()
+                
+                self.logger.info(
+                    f"到点触发: 时间误差 {(fired_at - target) * 1000:+.2f}ms，"
+                    f"时钟偏差不确定度 ±{clock.uncertainty * 1000:.1f}ms，"
+                    f"命令耗时 {(finished_at - fired_at) * 1000:.0f}ms"
+                )
+                if done is None:
+                    self.logger.error(f"触发命令执行失败: {command}")
+                    return False
+                return True
+            
+            if fire == "blind":
+                # 盲点即预订，集群中只有取得该车场租约的节点到点点击
+                booked = self._book_with_lease(lot, trigger)
+                if booked is None:
+                    self.logger.info(f"车场 {lot.name} 由其他节点负责盲点预订，本节点不触发")
+                    return False
+                if booked:
+                    self.logger.info(f"已在释放时刻点击预订按钮（{lot.name}）")
+                    self.booked = True
+                return booked
+            
+            if not trigger():
+                return False
+            
+            # 刷新: 返回后立即重新进入页面，识别并预订；未抢到时在重试窗口内继续刷新
+            time.sleep(Config.STRIKE_SETTLE_DELAY)
+            give_up_at = time.perf_counter() + Config.STRIKE_RETRY_DURATION
+            while self.is_running:
+                if self._booked_elsewhere():
+                    return False
+                
+                x, y = Config.PARKING_BUTTON_COORDS
+                channel.run(f"input tap {x} {y}", Config.ADB_COMMAND_TIMEOUT)
+                self._wait_page_loaded()
+                
+                counts = self._check_parking_availability()
+                lot = self.lots.select_best(counts)
+                if lot is not None:
+                    self.logger.info(f"发现可用车位 {counts[lot.name]} 个（{lot.name}），尝试预订...")
+                    # 租约被其他节点持有时继续刷新，对方失败释放租约后仍有机会
+                    booked = self._book_with_lease(lot, lambda: self._book_parking(lot))
+                    if booked is not None:
+                        self.booked = booked
+                        return booked
+                
+                if time.perf_counter() >= give_up_at:
+                    self.logger.info("重试窗口已结束，未抢到车位")
+                    return False
+                
+                channel.run("input keyevent KEYCODE_BACK", Config.ADB_COMMAND_TIMEOUT)
+                time.sleep(Config.STRIKE_SETTLE_DELAY)
+            
+            return False
+            
+        finally:
+            self.is_running = False
+            channel.close()
+            if self.fleet is not None:
+                self.fleet.leave()
+    
     def calibrate_coordinates(self):
         """
         坐标校准功能，帮助用户确定正确的点击坐标
         """
         self.logger.info("=== 坐标校准模式 ===")
         
-        if not self.adb.connect_device():
+        if not self.device_connected and not self.adb.connect_device():
             self.logger.error("无法连接到设备")
             return
         
+        self._notify_first_poll()
+        
         # 获取屏幕尺寸
         screen_size = self.adb.get_screen_size()
         if screen_size:
@@ -203,6 +827,8 @@ class ParkingGrabber:
         
         # 截图用于分析
         if self.adb.take_screenshot("calibration_screenshot.png"):
+            # 校准模式不识别车位，截图即为首个读数
+            self._notify_first_reading()
             self.logger.info("校准截图已保存: calibration_screenshot.png")
             self.logger.info("请根据截图调整 config.py 中的坐标配置")
         
@@ -213,13 +839,11 @@ class ParkingGrabber:
         x, y = Config.PARKING_BUTTON_COORDS
         self.logger.info(f"车位临停按钮坐标: ({x}, {y})")
         
-        # 测试立即预订按钮
-        x, y = Config.BOOK_NOW_BUTTON_COORDS
-        self.logger.info(f"立即预订按钮坐标: ({x}, {y})")
-        
-        # 测试车位数量识别区域
-        region = Config.PARKING_COUNT_REGION
-        self.logger.info(f"车位数量识别区域: {region}")
+        # 测试各车场的立即预订按钮和车位数量识别区域
+        for lot in self.lots.lots:
+            x, y = lot.book_coords
+            self.logger.info(f"[{lot.name}] 立即预订按钮坐标: ({x}, {y})")
+            self.logger.info(f"[{lot.name}] 车位数量识别区域: {lot.region}，优先级: {lot.priority}")
     
     def test_ocr(self):
         """
@@ -227,23 +851,28 @@ class ParkingGrabber:
         """
         self.logger.info("=== OCR识别测试 ===")
         
-        if not self.adb.connect_device():
+        if not self.device_connected and not self.adb.connect_device():
             self.logger.error("无法连接到设备")
             return
         
+        self._notify_first_poll()
+        
         # 截图
         if not self.adb.take_screenshot("ocr_test.png"):
             self.logger.error("截图失败")
             return
         
-        # 测试车位数量识别
-        parking_count = self.recognizer.extract_parking_count("ocr_test.png")
-        
-        if parking_count is not None:
-            self.logger.info(f"识别结果: {parking_count} 个车位")
-        else:
-            self.logger.warning("OCR识别失败")
+        # 测试各车场车位数量识别
+        counts = self.recognizer.extract_lot_counts("ocr_test.png", self.lots.lots)
+        self._notify_first_reading()
         
-        # 保存调试图像
-        self.recognizer.save_debug_image("ocr_test.png", "ocr_debug.png")
-        self.logger.info("调试图像已保存: ocr_debug.png")
\ No newline at end of file
+        for lot in self.lots.lots:
+            if counts[lot.name] is not None:
+                self.logger.info(f"识别结果: {counts[lot.name]} 个车位（{lot.name}）")
+            else:
+                self.logger.warning(f"OCR识别失败（{lot.name}）")
+            
+            # 保存调试图像
+            output_path = "ocr_debug.png" if lot.name == DEFAULT_LOT_NAME else f"ocr_debug_{lot.name}.png"
+            self.recognizer.save_debug_image("ocr_test.png", output_path, lot.region)
+            self.logger.info(f"调试图像已保存: {output_path}")
\ No newline at end of file
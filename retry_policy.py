@@ -0,0 +1,261 @@
+"""
+重试策略 - 为 ADB 操作提供截止时间、抖动指数退避和熔断器
+"""
+
+import time
+import random
+import logging
+import threading
+import subprocess
+from typing import Callable, Optional, Any, Dict
+from config import Config
+
+
+class Deadline:
+    """截止时间类，表示一次检查周期内剩余的可用时间"""
+
+    def __init__(self, seconds: Optional[float]):
+        """
+        初始化截止时间
+
+        Args:
+            seconds (Optional[float]): 从现在起的可用秒数，None 表示不限时
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """
+        获取剩余时间
+
+        Returns:
+            Optional[float]: 剩余秒数（不小于 0），不限时返回 None
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        判断是否已超过截止时间
+
+        Returns:
+            bool: 是否已过期
+        """
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def clamp(self, timeout: float) -> float:
+        """
+        将单次调用的超时时间限制在剩余时间之内
+
+        Args:
+            timeout (float): 调用默认超时时间
+
+        Returns:
+            float: 实际使用的超时时间
+        """
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+
+class CircuitBreaker:
+    """熔断器类，连续失败达到阈值后短路调用，冷却后放行一次试探"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold (int): 触发熔断的连续失败次数
+            reset_timeout (float): 熔断后进入半开状态的冷却时间（秒）
+        """
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.BREAKER_RESET_TIMEOUT
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        判断当前是否允许发起调用
+
+        Returns:
+            bool: 是否允许
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            return self.state != self.OPEN
+
+    def record_success(self):
+        """记录一次成功调用，熔断器恢复闭合"""
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self) -> bool:
+        """
+        记录一次失败调用
+
+        Returns:
+            bool: 本次失败是否导致熔断器打开
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                tripped = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return tripped
+            return False
+
+    def reset(self):
+        """强制闭合熔断器（例如重连成功后）"""
+        self.record_success()
+
+
+class RetryPolicy:
+    """重试策略类，统一处理截止时间、抖动指数退避、熔断与快速重连，并统计计数"""
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None,
+                 max_delay: float = None, breaker: CircuitBreaker = None,
+                 reconnect: Callable[[], bool] = None):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts (int): 最大尝试次数，默认使用 Config.MAX_RETRY_ATTEMPTS
+            base_delay (float): 退避基准时间（秒），默认使用 Config.RETRY_DELAY
+            max_delay (float): 单次退避上限（秒）
+            breaker (CircuitBreaker): 熔断器
+            reconnect (Callable[[], bool]): 熔断打开时执行的快速重连函数
+        """
+        self.max_attempts = max_attempts or Config.MAX_RETRY_ATTEMPTS
+        self.base_delay = Config.RETRY_DELAY if base_delay is None else base_delay
+        self.max_delay = max_delay or Config.RETRY_MAX_DELAY
+        self.breaker = breaker or CircuitBreaker()
+        self.reconnect = reconnect
+        self.logger = logging.getLogger(__name__)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "deadline_exceeded": 0,
+            "short_circuited": 0,
+            "breaker_trips": 0,
+            "reconnects": 0,
+            "reconnect_failures": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        """线程安全地累加计数器"""
+        with self._lock:
+            self.counters[name] += amount
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        计算第 attempt 次失败后的退避时间（full jitter）
+
+        Args:
+            attempt (int): 已失败次数，从 1 开始
+
+        Returns:
+            float: 退避秒数
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _fast_reconnect(self):
+        """熔断打开时执行快速重连，成功则闭合熔断器"""
+        if self.reconnect is None:
+            return
+
+        self._count("reconnects")
+        self.logger.warning("熔断器已打开，尝试快速重连设备")
+        if self.reconnect():
+            self.breaker.reset()
+            self.logger.info("快速重连成功，熔断器已闭合")
+        else:
+            self._count("reconnect_failures")
+            self.logger.error("快速重连失败")
+
+    def call(self, operation: Callable[[float], Any], timeout: float,
+             deadline: Deadline = None, retry: bool = True,
+             is_success: Callable[[Any], bool] = bool) -> Any:
+        """
+        按策略执行一次操作
+
+        Args:
+            operation (Callable[[float], Any]): 接收超时时间的操作函数，超时抛出 TimeoutError
+                或 subprocess.TimeoutExpired
+            timeout (float): 单次调用的默认超时时间（秒）
+            deadline (Deadline): 本周期截止时间，None 表示不限时
+            retry (bool): 失败后是否重试（非幂等操作应设为 False）
+            is_success (Callable[[Any], bool]): 判断返回值是否成功
+
+        Returns:
+            Any: 最后一次操作的返回值，未能执行时返回 None
+        """
+        self._count("calls")
+        attempts = self.max_attempts if retry else 1
+        result = None
+
+        for attempt in range(1, attempts + 1):
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                return None
+
+            if deadline is not None and deadline.expired():
+                self._count("deadline_exceeded")
+                self.logger.warning("已超过本周期截止时间，放弃调用")
+                return None
+
+            call_timeout = timeout if deadline is None else deadline.clamp(timeout)
+
+            try:
+                result = operation(call_timeout)
+                if is_success(result):
+                    self.breaker.record_success()
+                    self._count("successes")
+                    return result
+            except (subprocess.TimeoutExpired, TimeoutError):
+                self._count("timeouts")
+                self.logger.warning(f"操作超时 ({call_timeout:.1f}s, 尝试 {attempt}/{attempts})")
+                result = None
+
+            self._count("failures")
+            if self.breaker.record_failure():
+                self._count("breaker_trips")
+                self._fast_reconnect()
+
+            if attempt < attempts:
+                delay = self.backoff_delay(attempt)
+                if deadline is not None:
+                    remaining = deadline.remaining()
+                    if remaining is not None and delay >= remaining:
+                        self._count("deadline_exceeded")
+                        return result
+                self._count("retries")
+                time.sleep(delay)
+
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取策略计数器快照
+
+        Returns:
+            Dict[str, Any]: 计数器与熔断器状态
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        stats["breaker_state"] = self.breaker.state
+        return stats
@@ -0,0 +1,120 @@
+"""
+启动耗时基准 - 测量各运行模式从进程启动到首次轮询设备、以及到拿到首个读数的时间
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import statistics
+import subprocess
+from typing import Dict, Any, List
+
+# 子进程输出中标记启动阶段的前缀，后跟阶段名: poll（首次轮询设备前）/ reading（首个读数返回后）
+FIRST_POLL_MARKER = "__FIRST_POLL__"
+# 基准测试父进程记录启动时刻的环境变量
+START_TIME_ENV = "PARKING_STARTUP_T0"
+# 关注其是否被加载的重量级依赖
+HEAVY_MODULES = ("cv2", "numpy", "PIL", "pytesseract")
+
+
+def report_first_poll(stage: str):
+    """
+    启动阶段钩子：输出自进程启动以来的耗时及已加载的重量级依赖，到达首个读数后退出
+
+    首次轮询时 OCR 依赖尚未按需加载，只有首个读数的耗时包含延迟加载的开销，因此两者都输出。
+    结果写到 stderr，避免与输出到 stdout 的日志交错。
+
+    Args:
+        stage (str): "poll" 首次轮询设备前，"reading" 首个读数返回后
+    """
+    t0 = float(os.environ.get(START_TIME_ENV, time.time()))
+    loaded = ",".join(name for name in HEAVY_MODULES if name in sys.modules) or "-"
+    print(f"{FIRST_POLL_MARKER} {stage} {time.time() - t0:.4f} {loaded}", file=sys.stderr, flush=True)
+    if stage == "reading":
+        raise SystemExit(0)
+
+
+def measure_mode(mode: str, prewarm: bool = False, timeout: float = 120) -> Dict[str, Any]:
+    """
+    启动一次子进程并测量指定模式的首次轮询和首个读数耗时
+
+    Args:
+        mode (str): 运行模式
+        prewarm (bool): 是否启用预热
+        timeout (float): 子进程超时时间（秒）
+
+    Returns:
+        Dict[str, Any]: 包含 poll_seconds、seconds（首个读数）、modules（首个读数时已加载的依赖），
+            失败时包含 error
+    """
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    command = [sys.executable, main_path, "--mode", mode, "--startup-probe"]
+    if prewarm:
+        command.append("--prewarm")
+
+    env = dict(os.environ)
+    env[START_TIME_ENV] = repr(time.time())
+
+    try:
+        result = subprocess.run(command, capture_output=True, text=True,
+                                encoding="utf-8", errors="replace",
+                                timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        return {"error": "超时"}
+
+    stages = {
+        match.group(1): (float(match.group(2)), match.group(3))
+        for match in re.finditer(rf"{FIRST_POLL_MARKER} (\S+) (\S+) (\S+)", result.stderr)
+    }
+    if "reading" in stages:
+        seconds, modules = stages["reading"]
+        return {"poll_seconds": stages.get("poll", (seconds, ""))[0], "seconds": seconds, "modules": modules}
+
+    lines = (result.stderr or result.stdout).strip().splitlines()
+    return {"error": lines[-1] if lines else f"退出码 {result.returncode}"}
+
+
+def run_startup_benchmark(modes: List[str], repeats: int = 3,
+                          prewarm: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    对多个模式重复测量首次轮询和首个读数耗时并输出报告
+
+    Args:
+        modes (List[str]): 要测量的模式
+        repeats (int): 每个模式的重复次数
+        prewarm (bool): 是否启用预热
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 每个模式首个读数耗时的中位数、最小值、最大值，首次轮询耗时中位数及已加载依赖
+    """
+    logger = logging.getLogger(__name__)
+    report = {}
+
+    for mode in modes:
+        samples = [measure_mode(mode, prewarm) for _ in range(repeats)]
+        timings = [s["seconds"] for s in samples if "seconds" in s]
+        poll_timings = [s["poll_seconds"] for s in samples if "poll_seconds" in s]
+
+        if not timings:
+            report[mode] = {"error": samples[-1]["error"]}
+            logger.warning(f"[{mode}] 未拿到首个读数: {samples[-1]['error']}")
+            continue
+
+        report[mode] = {
+            "first_poll_median_ms": statistics.median(poll_timings) * 1000,
+            "median_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "max_ms": max(timings) * 1000,
+            "runs": len(timings),
+            "modules": samples[-1].get("modules", "-"),
+        }
+        logger.info(
+            f"[{mode}] 首次轮询 中位数 {report[mode]['first_poll_median_ms']:.0f}ms，"
+            f"首个读数 中位数 {report[mode]['median_ms']:.0f}ms "
+            f"(最小 {report[mode]['min_ms']:.0f}ms, 最大 {report[mode]['max_ms']:.0f}ms, "
+            f"{len(timings)}/{repeats} 次成功) 已加载依赖: {report[mode]['modules']}"
+        )
+
+    return report
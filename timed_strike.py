@@ -0,0 +1,159 @@
+"""
+定时抢占 - 主机与设备时钟同步、释放时刻解析及高精度等待
+"""
+
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from config import Config
+from device_watchdog import ShellChannel
+
+# 支持的释放时刻格式
+RELEASE_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%H:%M:%S", "%H:%M")
+
+
+class ClockSync:
+    """时钟同步类，通过常驻 shell 读取设备时间，估算设备相对主机的时钟偏差"""
+
+    def __init__(self, channel: ShellChannel):
+        """
+        初始化时钟同步
+
+        Args:
+            channel (ShellChannel): 已打开的设备 shell 通道
+        """
+        self.channel = channel
+        self.logger = logging.getLogger(__name__)
+        self.offset: Optional[float] = None  # 设备时间 - 主机时间（秒）
+        self.uncertainty: Optional[float] = None  # 偏差估计误差上限（秒）
+
+    def sample(self) -> Optional[Tuple[float, float]]:
+        """
+        采集一次时钟偏差样本
+
+        Returns:
+            Optional[Tuple[float, float]]: (偏差, 往返耗时)，失败时返回 None
+        """
+        t0 = time.time()
+        output = self.channel.run("date +%s.%N", Config.ADB_COMMAND_TIMEOUT)
+        t1 = time.time()
+
+        if not output:
+            return None
+
+        text = output[-1].strip()
+        # 部分旧版 toybox 不支持 %N，会原样输出 "N"
+        if text.endswith(".N") or text.endswith("."):
+            text = text.split(".")[0]
+            self.logger.warning("设备 date 不支持纳秒，时钟偏差精度仅为 1 秒")
+
+        try:
+            device_time = float(text)
+        except ValueError:
+            self.logger.error(f"无法解析设备时间: {text}")
+            return None
+
+        # 假设请求与响应耗时对称，设备读数对应往返的中点
+        return device_time - (t0 + t1) / 2, t1 - t0
+
+    def measure(self, samples: int = None) -> Optional[float]:
+        """
+        多次采样，取往返耗时最短的样本作为偏差估计
+
+        Args:
+            samples (int): 采样次数，默认使用 Config.CLOCK_SYNC_SAMPLES
+
+        Returns:
+            Optional[float]: 设备相对主机的时钟偏差（秒），失败时返回 None
+        """
+        results = [self.sample() for _ in range(samples or Config.CLOCK_SYNC_SAMPLES)]
+        results = [r for r in results if r is not None]
+
+        if not results:
+            self.logger.error("时钟同步失败：无法读取设备时间")
+            return None
+
+        offset, rtt = min(results, key=lambda r: r[1])
+        self.offset = offset
+        self.uncertainty = rtt / 2
+        self.logger.info(f"设备时钟偏差 {offset * 1000:+.1f}ms（±{self.uncertainty * 1000:.1f}ms）")
+        return offset
+
+    def to_host_time(self, device_time: float) -> float:
+        """
+        将设备时间换算为主机时间
+
+        Args:
+            device_time (float): 设备时钟的 Unix 时间戳
+
+        Returns:
+            float: 主机时钟的 Unix 时间戳
+        """
+        return device_time - (self.offset or 0.0)
+
+
+def parse_release_time(text: str, now: datetime = None) -> float:
+    """
+    解析释放时刻
+
+    支持 Unix 时间戳或本地时间；只给出时分（秒）时取下一个该时刻。
+
+    Args:
+        text (str): 释放时刻，如 "10:00"、"2026-10-20 10:00:00" 或 "1792393200"
+        now (datetime): 当前时间，默认为系统当前时间
+
+    Returns:
+        float: 释放时刻的 Unix 时间戳
+
+    Raises:
+        ValueError: 无法解析时抛出
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    now = now or datetime.now()
+    for fmt in RELEASE_TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+
+        if fmt.startswith("%H"):
+            parsed = now.replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second, microsecond=0)
+            if parsed <= now:
+                parsed += timedelta(days=1)
+        return parsed.timestamp()
+
+    raise ValueError(f"无法解析释放时刻: {text}")
+
+
+def precise_wait_until(target: float, spin_window: float = None) -> float:
+    """
+    等待到指定的 perf_counter 时刻：先分段休眠，最后一小段忙等
+
+    使用单调时钟，等待期间系统时间被校正也不受影响。
+
+    Args:
+        target (float): 目标 time.perf_counter() 值
+        spin_window (float): 最后忙等的时长（秒），默认使用 Config.STRIKE_SPIN_WINDOW
+
+    Returns:
+        float: 实际结束等待时的 time.perf_counter() 值
+    """
+    if spin_window is None:
+        spin_window = Config.STRIKE_SPIN_WINDOW
+
+    while True:
+        remaining = target - time.perf_counter()
+        if remaining <= spin_window:
+            break
+        # 分段休眠，保证 Ctrl+C 能及时响应
+        time.sleep(min(remaining - spin_window, 0.5))
+
+    while True:
+        now = time.perf_counter()
+        if now >= target:
+            return now
@@ -0,0 +1,275 @@
+"""
+时间线存储 - 以定长二进制记录追加保存车位识别结果，内存映射读取并支持区间查询
+"""
+
+import os
+import mmap
+import struct
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from config import Config
+from utils import Utils
+
+# 文件头: 魔数、版本、单条记录字节数，其余保留
+HEADER_FORMAT = "<4sHH8x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b"PKTL"
+VERSION = 1
+
+# 记录: 时间戳 (float64)、设备编号 (uint16)、车场编号 (uint16)、车位数 (int16)、置信度 (float32)
+RECORD_FORMAT = "<dHHhf"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = [("ts", "<f8"), ("device", "<u2"), ("lot", "<u2"), ("count", "<i2"), ("confidence", "<f4")]
+
+
+class TimelineStore:
+    """时间线存储类，追加写入定长记录，设备 / 车场名称映射为编号保存在旁路 JSON 中"""
+
+    def __init__(self, path: str = None):
+        """
+        初始化时间线存储
+
+        Args:
+            path (str): 数据文件路径，默认使用 Config.TIMELINE_PATH
+        """
+        self.path = path or Config.TIMELINE_PATH
+        self.names_path = os.path.splitext(self.path)[0] + ".names.json"
+        self.logger = logging.getLogger(__name__)
+        self.names = Utils.load_config(self.names_path) or {"devices": [], "lots": []}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _name_id(self, kind: str, name: str) -> int:
+        """获取名称对应的编号，新名称追加并立即保存映射"""
+        names = self.names[kind]
+        if name not in names:
+            names.append(name)
+            Utils.save_config(self.names, self.names_path)
+        return names.index(name)
+
+    def _open_for_append(self):
+        """打开数据文件用于追加，新文件先写入文件头"""
+        if self._file is not None:
+            return
+
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "ab")
+        if new_file:
+            self._file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE))
+
+    def append(self, timestamp: float, device: str, lot: str, count: int,
+               confidence: float = float("nan")) -> bool:
+        """
+        追加一条识别记录
+
+        Args:
+            timestamp (float): Unix 时间戳
+            device (str): 设备 ID
+            lot (str): 车场名称
+            count (int): 剩余车位数
+            confidence (float): 识别置信度，未知时为 NaN
+
+        Returns:
+            bool: 写入是否成功
+        """
+        try:
+            with self._lock:
+                self._open_for_append()
+                record = struct.pack(
+                    RECORD_FORMAT, timestamp,
+                    self._name_id("devices", device), self._name_id("lots", lot),
+                    max(-32768, min(32767, count)), confidence
+                )
+                self._file.write(record)
+                self._file.flush()
+            return True
+        except Exception as e:
+            self.logger.error(f"写入时间线失败: {e}")
+            return False
+
+    def close(self):
+        """关闭数据文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def query(self, start: float = None, end: float = None, device: str = None,
+              lot: str = None):
+        """
+        按时间区间和设备 / 车场筛选记录
+
+        数据文件以内存映射方式读取，记录按时间追加，时间区间通过二分查找定位。
+
+        Args:
+            start (float): 起始时间戳（含），None 表示不限
+            end (float): 结束时间戳（不含），None 表示不限
+            device (str): 设备 ID，None 表示全部
+            lot (str): 车场名称，None 表示全部
+
+        Returns:
+            numpy.ndarray: 结构化记录数组，字段为 ts / device / lot / count / confidence
+        """
+        import numpy as np
+
+        dtype = np.dtype(RECORD_DTYPE)
+        empty = np.zeros(0, dtype=dtype)
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= HEADER_SIZE:
+            return empty
+
+        with open(self.path, "rb") as f:
+            magic, version, record_size = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+            if magic != MAGIC or record_size != RECORD_SIZE:
+                raise ValueError(f"不是有效的时间线文件: {self.path}")
+
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # 忽略进程中断时可能残留的半条记录
+        total = (len(mapped) - HEADER_SIZE) // RECORD_SIZE
+        records = np.frombuffer(mapped, dtype=dtype, count=total, offset=HEADER_SIZE)
+
+        lo = 0 if start is None else int(np.searchsorted(records["ts"], start, side="left"))
+        hi = total if end is None else int(np.searchsorted(records["ts"], end, side="left"))
+        records = records[lo:hi]
+
+        mask = np.ones(len(records), dtype=bool)
+        for kind, field, name in (("devices", "device", device), ("lots", "lot", lot)):
+            if name is None:
+                continue
+            if name not in self.names[kind]:
+                return empty
+            mask &= records[field] == self.names[kind].index(name)
+
+        # 复制出查询结果，避免结果数组引用已映射的文件
+        return records[mask].copy()
+
+    def availability_windows(self, records, per_device: bool = False) -> List[Dict[str, Any]]:
+        """
+        统计有空余车位的连续时间窗口
+
+        默认按车场统计：多台设备观测同一车场时，各设备的样本按时间合并为一个序列，
+        同一次释放只计一次；per_device 为 True 时按设备和车场分别统计。
+        窗口从首次读到车位数 > 0 的样本开始，到之后首次读到 0 的样本结束；
+        区间末尾仍有空位的窗口以最后一个样本为结束。区间内第一个样本就有空位的窗口
+        标记 open_at_start，其真实开始时间未知，不算作一次释放。
+
+        Args:
+            records (numpy.ndarray): query 返回的记录
+            per_device (bool): 是否按设备分别统计
+
+        Returns:
+            List[Dict[str, Any]]: 窗口列表，包含 device（合并统计时为 None）、lot、start、end、duration、
+                max_count、open_at_start
+        """
+        import numpy as np
+
+        if per_device:
+            groups = np.unique(records[["device", "lot"]]).tolist()
+        else:
+            groups = [(None, lot_id) for lot_id in np.unique(records["lot"]).tolist()]
+
+        windows = []
+        for device_id, lot_id in groups:
+            mask = records["lot"] == lot_id
+            if device_id is not None:
+                mask &= records["device"] == device_id
+            lot_records = records[mask]
+            lot_records = lot_records[np.argsort(lot_records["ts"], kind="stable")]
+            available = lot_records["count"] > 0
+            # 状态变化的位置: +1 为开始，-1 为结束
+            edges = np.diff(np.concatenate(([0], available.astype(np.int8), [0])))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
+
+            for s, e in zip(starts, ends):
+                end_index = e if e < len(lot_records) else e - 1
+                start_ts = float(lot_records["ts"][s])
+                end_ts = float(lot_records["ts"][end_index])
+                windows.append({
+                    "device": None if device_id is None else self.names["devices"][device_id],
+                    "lot": self.names["lots"][lot_id],
+                    "start": start_ts,
+                    "end": end_ts,
+                    "duration": end_ts - start_ts,
+                    "max_count": int(lot_records["count"][s:e].max()),
+                    "open_at_start": bool(s == 0),
+                })
+
+        return sorted(windows, key=lambda w: w["start"])
+
+    def summarize(self, start: float = None, end: float = None, device: str = None,
+                  lot: str = None, per_device: bool = False) -> Dict[str, Any]:
+        """
+        汇总区间内的车位释放频率和可用窗口时长
+
+        Args:
+            start (float): 起始时间戳
+            end (float): 结束时间戳
+            device (str): 设备 ID
+            lot (str): 车场名称
+            per_device (bool): 是否按设备分别统计窗口（同一次释放会被每台设备各计一次）
+
+        Returns:
+            Dict[str, Any]: 汇总结果
+        """
+        records = self.query(start, end, device, lot)
+        if len(records) == 0:
+            return {"样本数": 0}
+
+        # 区间开始时已有空位的窗口不计入释放次数和时长统计
+        windows = [w for w in self.availability_windows(records, per_device) if not w["open_at_start"]]
+        span_days = max((records["ts"][-1] - records["ts"][0]) / 86400, 1 / 24)
+        durations = sorted(w["duration"] for w in windows)
+        hours = Counter(datetime.fromtimestamp(w["start"]).hour for w in windows)
+
+        summary = {
+            "样本数": int(len(records)),
+            "时间范围": f"{datetime.fromtimestamp(records['ts'][0]):%Y-%m-%d %H:%M:%S} ~ "
+                        f"{datetime.fromtimestamp(records['ts'][-1]):%Y-%m-%d %H:%M:%S}",
+            "释放次数": len(windows),
+            "日均释放次数": f"{len(windows) / span_days:.1f}",
+        }
+
+        if durations:
+            summary.update({
+                "窗口时长中位数": Utils.format_duration(durations[len(durations) // 2]),
+                "窗口时长平均": Utils.format_duration(sum(durations) / len(durations)),
+                "窗口时长最长": Utils.format_duration(durations[-1]),
+                "释放高峰时段": ", ".join(f"{hour:02d}时({n}次)" for hour, n in hours.most_common(3)),
+            })
+
+        return summary
+
+
+def parse_time_arg(text: Optional[str]) -> Optional[float]:
+    """
+    解析命令行中的时间参数
+
+    Args:
+        text (Optional[str]): "2026-10-01"、"2026-10-01 08:00[:00]" 或 Unix 时间戳
+
+    Returns:
+        Optional[float]: Unix 时间戳，未提供时返回 None
+
+    Raises:
+        ValueError: 无法解析时抛出
+    """
+    if not text:
+        return None
+
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+
+    raise ValueError(f"无法解析时间: {text}")